@@ -1,4 +1,14 @@
-from rest_framework import viewsets, permissions
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from reports import location_history
+from reports.presence import get_presence
 from .models import User
 from .serializers import UserSerializer
 
@@ -12,3 +22,81 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         if user.role == 'admin':
             return User.objects.all()
         return User.objects.filter(id=user.id)
+
+    @action(detail=False, methods=['get'])
+    def online(self, request):
+        """Workers currently connected, with their live positions (admin only)"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can view the live fleet'}, status=status.HTTP_403_FORBIDDEN)
+
+        live = get_presence().online()
+        names = dict(User.objects.filter(id__in=list(live)).values_list('id', 'username'))
+        workers = [
+            {
+                'id': wid,
+                'username': names.get(wid, ''),
+                'lat': entry['lat'],
+                'lng': entry['lng'],
+                'last_seen': datetime.fromtimestamp(entry['last_seen'], tz=dt_timezone.utc),
+            }
+            for wid, entry in live.items()
+        ]
+        return Response({'count': len(workers), 'workers': workers})
+
+    @action(detail=True, methods=['get'])
+    def location_history(self, request, pk=None):
+        """Replay a worker's track: ?start=&end= (ISO 8601, default the last 24 hours), ?max_points="""
+        worker = self.get_object()
+        window = self._time_window(request)
+        if window is None:
+            return Response({'error': 'start and end must be ISO 8601 datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = window
+
+        try:
+            max_points = int(request.query_params.get('max_points', settings.LOCATION_HISTORY_MAX_POINTS))
+        except ValueError:
+            max_points = settings.LOCATION_HISTORY_MAX_POINTS
+        max_points = min(max(max_points, 2), settings.LOCATION_HISTORY_MAX_POINTS)
+
+        track = location_history.points(worker.id, start, end)
+        return Response({
+            'worker_id': worker.id,
+            'start': start,
+            'end': end,
+            'total_points': len(track),
+            'points': [
+                {'t': at, 'lat': lat, 'lng': lng}
+                for at, lat, lng in location_history.thin(track, max_points)
+            ],
+        })
+
+    @action(detail=True, methods=['get'])
+    def distance(self, request, pk=None):
+        """Distance travelled and speeds over ?start=&end= (default the last 24 hours)"""
+        worker = self.get_object()
+        window = self._time_window(request)
+        if window is None:
+            return Response({'error': 'start and end must be ISO 8601 datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = window
+
+        summary = location_history.summarize(location_history.points(worker.id, start, end))
+        return Response({'worker_id': worker.id, 'start': start, 'end': end, **summary})
+
+    def _time_window(self, request):
+        end = timezone.now()
+        start = end - timedelta(hours=24)
+        try:
+            if request.query_params.get('end'):
+                end = parse_datetime(request.query_params['end'])
+            if request.query_params.get('start'):
+                start = parse_datetime(request.query_params['start'])
+        except ValueError:
+            # Well formed but not a real date, e.g. month 13
+            return None
+        if start is None or end is None:
+            return None
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        return start, end
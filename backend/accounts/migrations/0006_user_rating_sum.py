@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-17 12:43
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    WasteReport = apps.get_model('reports', 'WasteReport')
+    rated = (
+        WasteReport.objects.filter(assigned_worker__isnull=False, rating__isnull=False)
+        .values('assigned_worker_id')
+        .annotate(total=Sum('rating'), count=Count('id'), average=Avg('rating'))
+        .order_by()
+    )
+    for row in rated:
+        User.objects.filter(pk=row['assigned_worker_id']).update(
+            rating_sum=row['total'], total_ratings=row['count'], average_rating=row['average'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_dark_mode'),
+        ('reports', '0018_workerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
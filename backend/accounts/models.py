@@ -25,9 +25,11 @@ class User(AbstractUser):
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     last_location_update = models.DateTimeField(null=True, blank=True)
 
-    # Performance tracking
+    # Performance tracking: running totals over rated reports, updated with F()
+    # increments (reports.worker_stats); average_rating is rating_sum / total_ratings
     average_rating = models.FloatField(default=0.0)
     total_ratings = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
     
     # UI Preferences
     dark_mode = models.BooleanField(default=False)
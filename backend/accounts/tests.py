@@ -1,3 +1,56 @@
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import User
+
+
+class UserSaveTests(TestCase):
+    """Views changing one column of the signed-in user keep rating totals written since it was loaded"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('someone', password='x', role='citizen')
+        self.client.force_login(self.user)
+
+    def post_as_stale_user(self, url_name):
+        stale = User.objects.get(pk=self.user.pk)
+        # A rating lands while the request is running
+        User.objects.filter(pk=self.user.pk).update(rating_sum=9, total_ratings=2, average_rating=4.5)
+        with mock.patch('django.contrib.auth.middleware.get_user', return_value=stale):
+            return self.client.post(reverse(url_name))
+
+    def assertTotalsKept(self):
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.rating_sum, self.user.total_ratings, self.user.average_rating), (9, 2, 4.5))
+
+    def test_toggle_dark_mode(self):
+        response = self.post_as_stale_user('toggle_dark_mode')
+        self.assertEqual(response.json(), {'success': True, 'dark_mode': True})
+        self.assertTotalsKept()
+        self.assertTrue(self.user.dark_mode)
+
+    def test_become_worker(self):
+        self.post_as_stale_user('become_worker')
+        self.assertTotalsKept()
+        self.assertEqual(self.user.role, 'worker')
+
+
+class LocationHistoryTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', password='x', role='worker')
+        admin = User.objects.create_user('admin', password='x', role='admin')
+        self.api = APIClient()
+        self.api.force_authenticate(admin)
+
+    def test_invalid_window_is_a_bad_request(self):
+        for action in ('location_history', 'distance'):
+            for query in ('start=yesterday', 'start=2024-13-01T00:00', 'end=2024-02-30T00:00'):
+                with self.subTest(action=action, query=query):
+                    response = self.api.get(f'/api/users/{self.worker.id}/{action}/?{query}')
+                    self.assertEqual(response.status_code, 400)
 
-# Create your tests here.
+    def test_default_window(self):
+        response = self.api.get(f'/api/users/{self.worker.id}/distance/')
+        self.assertEqual(response.status_code, 200)
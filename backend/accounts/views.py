@@ -2,11 +2,11 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout, authenticate, get_user_model
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
-from django.db.models import Count
 import json
 
 from .forms import LoginForm, CitizenRegisterForm
 from reports.models import WasteReport
+from reports import daily_stats, dashboard_stats
 from notifications.models import Notification
 
 User = get_user_model()
@@ -37,13 +37,7 @@ def redirect_dashboard(request):
 def citizen_dashboard(request):
     user = request.user
 
-    total_reports = WasteReport.objects.filter(citizen=user).count()
-    pending_reports = WasteReport.objects.filter(
-        citizen=user, status="pending"
-    ).count()
-    resolved_reports = WasteReport.objects.filter(
-        citizen=user, status="resolved"
-    ).count()
+    stats = dashboard_stats.citizen(user.id)
 
     recent_reports = WasteReport.objects.filter(
         citizen=user
@@ -62,20 +56,13 @@ def citizen_dashboard(request):
         status="resolved",
         rating__isnull=True
     ).order_by("-resolved_at")[:3]
-    
-    assigned_reports = WasteReport.objects.filter(
-        citizen=user, status="assigned"
-    ).count()
-
-    notifications = user.notifications.filter(is_read=False)[:5]
 
     return render(request, "dashboards/citizen_dashboard.html", {
-        "total_reports": total_reports,
-        "pending_reports": pending_reports,
-        "resolved_reports": resolved_reports,
-        "assigned_reports": assigned_reports,
+        "total_reports": stats["total"],
+        "pending_reports": stats["pending"],
+        "resolved_reports": stats["resolved"],
+        "assigned_reports": stats["assigned"],
         "recent_reports": recent_reports,
-        "notifications": notifications,
         "verifying_reports": verifying_reports,
         "unrated_reports": unrated_reports,
     })
@@ -91,28 +78,20 @@ def admin_dashboard(request):
         return redirect("citizen_dashboard")
 
     # 📊 STATS
-    total_users = User.objects.count()
-    total_reports = WasteReport.objects.count()
-    pending_reports = WasteReport.objects.filter(status="pending").count()
-    assigned_reports = WasteReport.objects.filter(status="assigned").count()
-    resolved_reports = WasteReport.objects.filter(status="resolved").count()
+    stats = dashboard_stats.site()
 
     # 📈 CHART DATA
-    waste_data = (
-        WasteReport.objects
-        .values("waste_type")
-        .annotate(count=Count("id"))
-    )
+    waste_data = daily_stats.counts_by("waste_type")
 
     waste_labels = [w["waste_type"].title() for w in waste_data]
     waste_values = [w["count"] for w in waste_data]
 
     return render(request, "dashboards/admin_dashboard.html", {
-        "total_users": total_users,
-        "total_reports": total_reports,
-        "pending_reports": pending_reports,
-        "assigned_reports": assigned_reports,
-        "resolved_reports": resolved_reports,
+        "total_users": stats["users"],
+        "total_reports": stats["total"],
+        "pending_reports": stats["pending"],
+        "assigned_reports": stats["assigned"],
+        "resolved_reports": stats["resolved"],
         "waste_labels": json.dumps(waste_labels),
         "waste_values": json.dumps(waste_values),
     })
@@ -131,12 +110,9 @@ def worker_dashboard(request):
         status="assigned"
     ).order_by("-created_at")
 
-    assigned_tasks = assigned_reports.count()
-
-    completed_tasks = WasteReport.objects.filter(
-        assigned_worker=user,
-        status="resolved"
-    ).count()
+    stats = dashboard_stats.worker(user.id)
+    assigned_tasks = stats["assigned"]
+    completed_tasks = stats["resolved"]
 
     return render(request, "dashboards/worker_dashboard.html", {
         "assigned_tasks": assigned_tasks,
@@ -211,19 +187,16 @@ def user_profile(request):
     if request.method == "POST":
         if 'avatar' in request.FILES:
             user.avatar = request.FILES['avatar']
-            user.save()
+            user.save(update_fields=['avatar'])
         return redirect('user_profile')
 
     context = {}
 
     if user.role == "citizen":
-        context["total_filed"] = WasteReport.objects.filter(citizen=user).count()
+        context["total_filed"] = dashboard_stats.citizen(user.id)["total"]
     
     elif user.role == "worker":
-        context["completed_tasks"] = WasteReport.objects.filter(
-            assigned_worker=user, 
-            status="resolved"
-        ).count()
+        context["completed_tasks"] = dashboard_stats.worker(user.id)["resolved"]
     
     # Explicitly pass details to ensure availability
     context["user_email"] = user.email
@@ -251,7 +224,7 @@ def logout_view(request):
 def become_worker(request):
     if request.method == 'POST':
         request.user.role = 'worker'
-        request.user.save()
+        request.user.save(update_fields=['role'])
         return redirect('worker_dashboard')
     
     # Optional: If accessed via GET (though button should be POST), redirect back
@@ -266,7 +239,7 @@ def toggle_dark_mode(request):
     if request.method == 'POST':
         # Toggle the current state
         request.user.dark_mode = not request.user.dark_mode
-        request.user.save()
+        request.user.save(update_fields=['dark_mode'])
         
         return JsonResponse({
             'success': True,
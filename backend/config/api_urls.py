@@ -3,13 +3,14 @@ from rest_framework.routers import DefaultRouter
 from reports.api import WasteReportViewSet, SupportTicketViewSet
 from accounts.api import UserViewSet
 from accounts.api_views import api_login, api_register
-from notifications.api import NotificationViewSet
+from notifications.api import NotificationViewSet, BroadcastViewSet
 
 router = DefaultRouter()
 router.register(r'waste-reports', WasteReportViewSet, basename='waste-report')
 router.register(r'support-tickets', SupportTicketViewSet, basename='support-ticket')
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'broadcasts', BroadcastViewSet, basename='broadcast')
 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
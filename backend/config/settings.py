@@ -140,6 +140,30 @@ CHANNEL_LAYERS = {
 }
 
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Optimized routes per worker, see reports/route_cache.py
+    "routes": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "routes",
+        "TIMEOUT": int(os.getenv('ROUTE_CACHE_TTL', '300')),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv('ROUTE_CACHE_MAX_ENTRIES', '2000'))},
+    },
+}
+
+# The default cache holds state every process must agree on (route cache generations,
+# notification counters, dashboard stats, arrival state), so it shares the channel
+# layer's Redis when there is one. Only the "routes" alias stays process-local.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_REDIS_URL,
+    }
+
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
@@ -227,3 +251,103 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+
+
+# Route optimisation
+# 'osrm' asks the public OSRM trip service and falls back to the local solver;
+# 'local' never leaves the process.
+ROUTING_ENGINE = os.getenv('ROUTING_ENGINE', 'osrm')
+ROUTE_OPTIMIZER_TIME_BUDGET = float(os.getenv('ROUTE_OPTIMIZER_TIME_BUDGET', '0.5'))  # seconds
+
+OSRM_BASE_URL = os.getenv('OSRM_BASE_URL', 'https://router.project-osrm.org')
+OSRM_TIMEOUT = float(os.getenv('OSRM_TIMEOUT', '2.0'))  # seconds per OSRM request
+OSRM_POOL_SIZE = int(os.getenv('OSRM_POOL_SIZE', '4'))
+# After this many consecutive OSRM failures, skip it for OSRM_BREAKER_RESET seconds
+OSRM_BREAKER_THRESHOLD = int(os.getenv('OSRM_BREAKER_THRESHOLD', '3'))
+OSRM_BREAKER_RESET = float(os.getenv('OSRM_BREAKER_RESET', '30'))
+# Upper bound for a whole routing call, OSRM attempt plus local fallback
+ROUTING_DEADLINE = float(os.getenv('ROUTING_DEADLINE', '3.0'))
+
+# Cached routes are keyed on the worker's start position rounded to this many
+# decimal places (3 ~ 110 m)
+ROUTE_CACHE_SNAP_DECIMALS = int(os.getenv('ROUTE_CACHE_SNAP_DECIMALS', '3'))
+
+# Fleet planning (reports/fleet.py)
+FLEET_MAX_JOBS_PER_WORKER = int(os.getenv('FLEET_MAX_JOBS_PER_WORKER', '15'))
+# Each job a worker already holds counts as this many extra km when choosing who gets the next one
+FLEET_BALANCE_KM = float(os.getenv('FLEET_BALANCE_KM', '0.5'))
+FLEET_ROUTE_TIME_BUDGET = float(os.getenv('FLEET_ROUTE_TIME_BUDGET', '2.0'))  # seconds, shared by all workers
+
+# Auto-dispatch: assign new reports to the best nearby online worker (reports/dispatch.py)
+AUTO_DISPATCH_ENABLED = os.getenv('AUTO_DISPATCH_ENABLED', 'False') == 'True'
+AUTO_DISPATCH_RADIUS_KM = float(os.getenv('AUTO_DISPATCH_RADIUS_KM', '10'))
+AUTO_DISPATCH_CANDIDATES = int(os.getenv('AUTO_DISPATCH_CANDIDATES', '8'))
+# Score = distance + LOAD_KM per assigned job + RATING_KM per star below 5
+AUTO_DISPATCH_LOAD_KM = float(os.getenv('AUTO_DISPATCH_LOAD_KM', '1.0'))
+AUTO_DISPATCH_RATING_KM = float(os.getenv('AUTO_DISPATCH_RATING_KM', '0.5'))
+AUTO_DISPATCH_INDEX_TTL = float(os.getenv('AUTO_DISPATCH_INDEX_TTL', '5'))  # seconds
+
+# Worker GPS fixes are buffered and written to accounts_user in bulk this often (seconds);
+# 0 writes every fix immediately
+LOCATION_FLUSH_INTERVAL = float(os.getenv('LOCATION_FLUSH_INTERVAL', '5'))
+
+# "Worker Arriving" fires once when a worker comes within ARRIVAL_ENTER_KM of a job,
+# and can only fire again after they have moved beyond ARRIVAL_EXIT_KM
+ARRIVAL_ENTER_KM = float(os.getenv('ARRIVAL_ENTER_KM', '0.1'))
+ARRIVAL_EXIT_KM = float(os.getenv('ARRIVAL_EXIT_KM', '0.15'))
+ARRIVAL_STATE_TTL = int(os.getenv('ARRIVAL_STATE_TTL', str(12 * 3600)))  # seconds
+
+# Worker GPS history (reports.WorkerLocation); run `manage.py downsample_locations` periodically
+LOCATION_HISTORY_MIN_INTERVAL = float(os.getenv('LOCATION_HISTORY_MIN_INTERVAL', '1'))  # seconds between stored fixes
+LOCATION_HISTORY_RAW_HOURS = int(os.getenv('LOCATION_HISTORY_RAW_HOURS', '24'))  # then 30 s averages
+LOCATION_HISTORY_30S_HOURS = int(os.getenv('LOCATION_HISTORY_30S_HOURS', str(7 * 24)))  # then 5 min averages
+LOCATION_HISTORY_RETENTION_DAYS = int(os.getenv('LOCATION_HISTORY_RETENTION_DAYS', '90'))
+LOCATION_HISTORY_MAX_GAP = int(os.getenv('LOCATION_HISTORY_MAX_GAP', '600'))  # seconds; longer gaps aren't counted as travel
+LOCATION_HISTORY_MAX_POINTS = int(os.getenv('LOCATION_HISTORY_MAX_POINTS', '5000'))  # per replay response
+
+# Online-worker presence (reports/presence.py): a worker drops out this many seconds
+# after their last location fix or heartbeat (keep above GPS_INTERVAL_IDLE)
+PRESENCE_TTL = int(os.getenv('PRESENCE_TTL', '180'))
+
+# Admin live fleet map (ws/fleet/): workers are published into slippy-map tiles at this zoom
+FLEET_MAP_TILE_ZOOM = int(os.getenv('FLEET_MAP_TILE_ZOOM', '12'))
+FLEET_MAP_FPS = float(os.getenv('FLEET_MAP_FPS', '2'))  # frames per second per admin socket
+FLEET_MAP_MAX_TILES = int(os.getenv('FLEET_MAP_MAX_TILES', '400'))
+
+# Per-connection outbound WebSocket queue (reports/send_queue.py); location frames beyond
+# this are dropped oldest-first, notifications are always kept
+WS_SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '100'))
+
+# Adaptive worker GPS cadence (reports/gps.py), pushed to clients as 'gps_interval' messages
+GPS_INTERVAL_MIN = int(os.getenv('GPS_INTERVAL_MIN', '3'))  # seconds, near a job
+GPS_INTERVAL_MAX = int(os.getenv('GPS_INTERVAL_MAX', '30'))  # seconds, slowest while moving
+GPS_INTERVAL_IDLE = int(os.getenv('GPS_INTERVAL_IDLE', '120'))  # seconds, stationary
+GPS_IDLE_SPEED_KMH = float(os.getenv('GPS_IDLE_SPEED_KMH', '2'))
+GPS_TARGET_SPACING_M = float(os.getenv('GPS_TARGET_SPACING_M', '100'))  # metres between fixes while moving
+GPS_APPROACH_KM = float(os.getenv('GPS_APPROACH_KM', '0.5'))
+GPS_LOAD_SOFT_LIMIT = int(os.getenv('GPS_LOAD_SOFT_LIMIT', '500'))  # worker sockets per process
+GPS_DEADBAND_M = float(os.getenv('GPS_DEADBAND_M', '15'))  # fixes closer than this to the last one are dropped
+
+# Notification outbox (notifications/outbox.py), drained by `manage.py dispatch_notifications`
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv('NOTIFICATION_OUTBOX_BATCH_SIZE', '500'))
+NOTIFICATION_OUTBOX_POLL_INTERVAL = float(os.getenv('NOTIFICATION_OUTBOX_POLL_INTERVAL', '0.5'))  # seconds
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', '5'))
+NOTIFICATION_OUTBOX_RETRY_DELAY = float(os.getenv('NOTIFICATION_OUTBOX_RETRY_DELAY', '2'))  # seconds, doubled per attempt
+NOTIFICATION_OUTBOX_LEASE = float(os.getenv('NOTIFICATION_OUTBOX_LEASE', '30'))  # seconds an entry is held while being pushed
+# Without a dispatcher process (local runserver), deliver each notification right after commit;
+# start.sh and the Procfile's notifier run dispatch_notifications in production
+NOTIFICATION_DISPATCH_ON_COMMIT = os.getenv('NOTIFICATION_DISPATCH_ON_COMMIT', str(DEBUG)) == 'True'
+BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '5000'))  # notification rows per broadcast step
+NOTIFICATION_COUNTER_TTL = int(os.getenv('NOTIFICATION_COUNTER_TTL', '300'))  # seconds; cached unread counts
+NOTIFICATION_DELTA_LIMIT = int(os.getenv('NOTIFICATION_DELTA_LIMIT', '20'))
+NOTIFICATION_REPLAY_LIMIT = int(os.getenv('NOTIFICATION_REPLAY_LIMIT', '50'))  # rows sent on socket reconnect
+NOTIFICATION_REPLAY_CONCURRENCY = int(os.getenv('NOTIFICATION_REPLAY_CONCURRENCY', '8'))  # replay queries at once per process
+
+# Cached dashboard report counters (reports/dashboard_stats.py), dropped on report changes
+DASHBOARD_STATS_TTL = int(os.getenv('DASHBOARD_STATS_TTL', '600'))  # seconds
+
+# Report map clustering (reports/map_clusters.py, /api/waste-reports/map/)
+MAP_CLUSTER_CELL_BITS = int(os.getenv('MAP_CLUSTER_CELL_BITS', '2'))  # 2 -> 4x4 grid cells per map tile
+MAP_CLUSTER_MAX_ZOOM = int(os.getenv('MAP_CLUSTER_MAX_ZOOM', '16'))  # from here on, individual reports
+MAP_MAX_CLUSTERS = int(os.getenv('MAP_MAX_CLUSTERS', '1024'))  # grid cells per request
+MAP_MAX_POINTS = int(os.getenv('MAP_MAX_POINTS', '1000'))
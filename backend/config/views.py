@@ -1,14 +1,12 @@
 from django.shortcuts import render
-from django.contrib.auth import get_user_model
-from reports.models import WasteReport
-
-User = get_user_model()
+from reports import dashboard_stats
 
 def home(request):
     try:
-        total_resolved = WasteReport.objects.filter(status='resolved').count()
-        total_citizens = User.objects.count()
-        total_reports = WasteReport.objects.count()
+        stats = dashboard_stats.site()
+        total_resolved = stats['resolved']
+        total_citizens = stats['users']
+        total_reports = stats['total']
         
         # Calculate cleanup rate
         cleanup_rate = 100 if total_reports == 0 else int((total_resolved / total_reports) * 100)
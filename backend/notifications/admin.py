@@ -1,3 +1,21 @@
+from django.conf import settings
 from django.contrib import admin
+from django.db import transaction
 
-# Register your models here.
+from . import broadcasts
+from .models import Broadcast
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('title', 'role', 'status', 'recipients', 'delivered', 'created_at', 'finished_at')
+    list_filter = ('role', 'status')
+    readonly_fields = ('created_by', 'status', 'recipients', 'delivered', 'cursor', 'finished_at')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+            obj.recipients = broadcasts.segment_users(obj.role, obj.bbox, obj.active_days).count()
+        super().save_model(request, obj, form, change)
+        if not change and settings.NOTIFICATION_DISPATCH_ON_COMMIT:
+            transaction.on_commit(lambda: broadcasts.deliver(obj.id))
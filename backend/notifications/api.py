@@ -1,8 +1,11 @@
-from rest_framework import viewsets, permissions
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Notification
-from .serializers import NotificationSerializer
+from .models import Notification, Broadcast
+from .serializers import NotificationSerializer, BroadcastSerializer
+from django.conf import settings
+from django.db import transaction
+from . import broadcasts, counters, outbox
 
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
@@ -13,9 +16,77 @@ class NotificationViewSet(viewsets.ModelViewSet):
         return Notification.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        notification = serializer.save(user=self.request.user)
+        transaction.on_commit(lambda: counters.created([notification]))
+
+    def perform_update(self, serializer):
+        serializer.save()
+        counters.changed(self.request.user.id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        counters.changed(self.request.user.id)
+
+    @action(detail=False, methods=['get'])
+    def delta(self, request):
+        """
+        Notifications newer than ?since=<id> (newest first, at most
+        NOTIFICATION_DELTA_LIMIT) plus the unread count. 304 with no body if
+        there is nothing newer, after a single indexed query.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({'error': 'since must be a notification id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read from the database: the dispatcher creates rows in another process
+        rows = list(Notification.objects.filter(user=request.user, id__gt=since).order_by('-id')[:settings.NOTIFICATION_DELTA_LIMIT])
+        if since and not rows:
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        return Response({
+            'notifications': self.get_serializer(rows, many=True).data,
+            'unread': counters.unread_count(request.user.id),
+            'last_id': rows[0].id if rows else since,
+        })
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': counters.unread_count(request.user.id)})
+
+    @action(detail=False, methods=['get'])
+    def outbox_stats(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can view delivery stats'}, status=status.HTTP_403_FORBIDDEN)
+        from reports import send_queue
+        # WebSocket send queue totals are per process: the worker that served this request
+        return Response({**outbox.stats(), 'websocket_sends': {name: send_queue.totals[name] for name in ('sent', 'coalesced', 'dropped')}})
 
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        counters.all_read(request.user.id)
         return Response({'status': 'ok'})
+
+
+class BroadcastViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Admin announcements to a segment (role, optional bbox, optional active_days).
+    Creating one returns 201 straight away with the recipient count; the
+    notification dispatcher writes and pushes it in the background.
+    """
+    serializer_class = BroadcastSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.role != 'admin':
+            return Broadcast.objects.none()
+        return Broadcast.objects.all()
+
+    def create(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can send broadcasts'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        broadcast = broadcasts.create(created_by=request.user, **serializer.validated_data)
+        return Response(self.get_serializer(broadcast).data, status=status.HTTP_201_CREATED)
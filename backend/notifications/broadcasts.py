@@ -0,0 +1,139 @@
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from reports.models import WasteReport
+from . import counters
+from .models import Broadcast, Notification
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def role_group(role):
+    """Shared channel group every open notification socket of a role joins"""
+    return f"role_{role}"
+
+
+def in_bbox(lat, lng, bbox):
+    south, west, north, east = bbox
+    if lat is None or lng is None or not south <= lat <= north:
+        return False
+    return west <= lng <= east if west <= east else (lng >= west or lng <= east)
+
+
+def _bbox_q(bbox):
+    """Filter on latitude/longitude columns (users and reports both have them)"""
+    south, west, north, east = bbox
+    q = Q(latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        return q & Q(longitude__gte=west, longitude__lte=east)
+    return q & (Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def segment_users(role='all', bbox=None, active_days=None):
+    """
+    Active accounts in a segment.
+    bbox: users whose own position, or any of whose reports, is in the box.
+    active_days: users who logged in or reported within that many days.
+    """
+    qs = User.objects.filter(is_active=True)
+    if role != 'all':
+        qs = qs.filter(role=role)
+    if bbox:
+        reported_here = WasteReport.objects.filter(_bbox_q(bbox), citizen=OuterRef('pk'))
+        qs = qs.filter(_bbox_q(bbox) | Exists(reported_here))
+    if active_days:
+        since = timezone.now() - timedelta(days=active_days)
+        reported_since = WasteReport.objects.filter(citizen=OuterRef('pk'), created_at__gte=since)
+        qs = qs.filter(Q(last_login__gte=since) | Exists(reported_since))
+    return qs
+
+
+def create(title, message, role='all', bbox=None, active_days=None, level='info', created_by=None):
+    """Record a broadcast for the dispatcher to deliver; cheap enough for a request"""
+    broadcast = Broadcast.objects.create(
+        title=title, message=message, level=level,
+        role=role, bbox=bbox, active_days=active_days,
+        created_by=created_by,
+        recipients=segment_users(role, bbox, active_days).count(),
+    )
+    if settings.NOTIFICATION_DISPATCH_ON_COMMIT:
+        transaction.on_commit(lambda: deliver(broadcast.id))
+    return broadcast
+
+
+def process_chunk(chunk_size=None):
+    """
+    Write the next chunk of Notification rows for the oldest unfinished
+    broadcast, pushing it once every row exists. Returns rows written, or
+    None if there was nothing to do.
+    """
+    chunk_size = chunk_size or settings.BROADCAST_CHUNK_SIZE
+    with transaction.atomic():
+        broadcast = (
+            Broadcast.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'])
+            .order_by('id')
+            .first()
+        )
+        if broadcast is None:
+            return None
+
+        ids = list(
+            segment_users(broadcast.role, broadcast.bbox, broadcast.active_days)
+            .filter(id__gt=broadcast.cursor)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        Notification.objects.bulk_create(
+            [Notification(user_id=uid, title=broadcast.title, message=broadcast.message) for uid in ids],
+            batch_size=1000,
+        )
+        transaction.on_commit(lambda: counters.invalidate_many(ids))
+        broadcast.delivered += len(ids)
+        if ids:
+            broadcast.cursor = ids[-1]
+        finished = len(ids) < chunk_size
+        broadcast.status = 'done' if finished else 'sending'
+        if finished:
+            broadcast.finished_at = timezone.now()
+        broadcast.save(update_fields=['delivered', 'cursor', 'status', 'finished_at'])
+
+    if finished:
+        push(broadcast)
+    return len(ids)
+
+
+def deliver(broadcast_id):
+    """Run a broadcast to completion in this process (no dispatcher, e.g. runserver)"""
+    while Broadcast.objects.filter(id=broadcast_id, status__in=['pending', 'sending']).exists():
+        if process_chunk() is None:
+            break
+
+
+def push(broadcast):
+    """One group send to the shared role group; sockets outside the region filter it themselves"""
+    roles = [r for r, _ in Broadcast.ROLE_CHOICES if r != 'all'] if broadcast.role == 'all' else [broadcast.role]
+    channel_layer = get_channel_layer()
+    for role in roles:
+        try:
+            async_to_sync(channel_layer.group_send)(role_group(role), {
+                "type": "broadcast_notification",
+                "broadcast_id": broadcast.id,
+                "title": broadcast.title,
+                "message": broadcast.message,
+                "level": broadcast.level,
+                "bbox": broadcast.bbox,
+            })
+        except Exception as e:
+            # The rows are written; connected users see it on their next refresh
+            logger.warning("Could not push broadcast %s to %s: %s", broadcast.id, role, e)
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+# Per-user unread count, in the default cache.
+# A missing key is recomputed from the database; writers adjust a key only if
+# it is already there, so a stale value is never resurrected.
+
+
+def _unread_key(user_id):
+    return f"notif_unread:{user_id}"
+
+
+def unread_count(user_id):
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(_unread_key(user_id), count, settings.NOTIFICATION_COUNTER_TTL)
+    return count
+
+
+def created(notifications):
+    """Account for new (unread) Notification rows; call once they are committed"""
+    added = {}
+    for n in notifications:
+        added[n.user_id] = added.get(n.user_id, 0) + 1
+
+    for user_id, n in added.items():
+        try:
+            cache.incr(_unread_key(user_id), n)
+        except ValueError:
+            pass  # not cached; the next read counts from the database
+
+
+def invalidate_many(user_ids):
+    """Large fan-out (broadcast chunks): drop the users' cached values in one call"""
+    cache.delete_many([_unread_key(uid) for uid in user_ids])
+
+
+def all_read(user_id):
+    cache.set(_unread_key(user_id), 0, settings.NOTIFICATION_COUNTER_TTL)
+
+
+def marked_read(user_id, n):
+    """n of the user's notifications went from unread to read"""
+    if not n:
+        return
+    try:
+        if cache.decr(_unread_key(user_id), n) < 0:
+            cache.delete(_unread_key(user_id))
+    except ValueError:
+        pass  # not cached
+
+
+def changed(user_id):
+    """Something other than a create or mark-all-read touched the user's rows"""
+    cache.delete(_unread_key(user_id))
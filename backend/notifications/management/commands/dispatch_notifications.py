@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications import broadcasts, outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications (saved rows + WebSocket pushes) from the outbox, and broadcasts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain what is due now and exit')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=None, help='Seconds to sleep when idle')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.NOTIFICATION_OUTBOX_POLL_INTERVAL
+        while True:
+            close_old_connections()
+            delivered = outbox.dispatch_batch(options['batch_size'])
+            if delivered:
+                stats = outbox.stats()
+                self.stdout.write(
+                    f"delivered {delivered} (lag {stats['last_lag_seconds']:.2f}s), "
+                    f"{stats['pending']} pending, oldest {stats['oldest_pending_seconds']}s"
+                )
+            # Broadcasts go one chunk at a time, between outbox batches
+            written = broadcasts.process_chunk()
+            if written:
+                self.stdout.write(f"broadcast: wrote {written} notifications")
+            if delivered or written is not None:
+                continue
+            if options['once']:
+                break
+            time.sleep(interval)
@@ -10,6 +10,75 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at']),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username}: {self.title}"
+
+
+class OutboxEntry(models.Model):
+    """
+    A notification waiting to be delivered. Written in the same transaction
+    as the change that caused it; notifications.outbox drains these into
+    Notification rows and WebSocket pushes.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    level = models.CharField(max_length=20, default='info')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the Notification row exists, so a retry only repeats the push
+    notification = models.OneToOneField(Notification, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Outbox #{self.id} for user {self.user_id}: {self.title}"
+
+
+class Broadcast(models.Model):
+    """
+    One announcement to a segment of users. Notification rows are written in
+    chunks by the notification dispatcher (notifications.broadcasts), then a
+    single push goes to the shared role group.
+    """
+    ROLE_CHOICES = [
+        ('all', 'Everyone'),
+        ('citizen', 'Citizens'),
+        ('worker', 'Workers'),
+        ('admin', 'Admins'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('done', 'Done'),
+    ]
+
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    level = models.CharField(max_length=20, default='info')
+
+    # Segment
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='all')
+    bbox = models.JSONField(null=True, blank=True)  # [south, west, north, east]
+    active_days = models.PositiveIntegerField(null=True, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    recipients = models.PositiveIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0)
+    # Highest user id written so far; lets an interrupted broadcast resume without duplicates
+    cursor = models.BigIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Broadcast #{self.id} to {self.role}: {self.title}"
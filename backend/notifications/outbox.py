@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from . import counters
+from .models import Notification, OutboxEntry
+
+logger = logging.getLogger(__name__)
+
+# Totals for this process (the dispatcher's own, when run as a command)
+_metrics = {'delivered': 0, 'retried': 0, 'abandoned': 0, 'last_lag_seconds': None}
+
+
+def enqueue(user_id, title, message, level='info'):
+    """
+    Queue a notification for delivery. Call inside the transaction making the
+    change it describes; nothing is sent if that transaction rolls back.
+    """
+    entry = OutboxEntry.objects.create(user_id=user_id, title=title, message=message, level=level)
+    if settings.NOTIFICATION_DISPATCH_ON_COMMIT:
+        # No dispatcher process (e.g. runserver): deliver as soon as the change is committed
+        transaction.on_commit(dispatch_batch)
+    return entry
+
+
+def dispatch_batch(batch_size=None):
+    """
+    Deliver up to batch_size due outbox entries. Returns the number delivered.
+
+    1. Claim: rows are locked with SELECT ... FOR UPDATE SKIP LOCKED, the
+       Notification rows are bulk-created and linked to their entries, and
+       the entries are leased (available_at pushed NOTIFICATION_OUTBOX_LEASE
+       seconds ahead) so other dispatchers leave them alone. This commits
+       before anything is pushed, so every pushed id is a committed row.
+    2. Push to the channel layer, outside any transaction.
+    3. Settle: delivered entries are deleted; failed ones are rescheduled
+       with backoff until NOTIFICATION_OUTBOX_MAX_ATTEMPTS, keeping the
+       Notification row either way.
+
+    A dispatcher that dies between 2 and 3 leaves its entries to be pushed
+    again once the lease runs out, with the same notification ids, so a
+    client can drop the duplicate.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    now = timezone.now()
+
+    with transaction.atomic():
+        entries = list(
+            OutboxEntry.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if not entries:
+            return 0
+
+        fresh = [e for e in entries if e.notification_id is None]
+        if fresh:
+            notifications = Notification.objects.bulk_create([
+                Notification(user_id=e.user_id, title=e.title, message=e.message) for e in fresh
+            ])
+            for entry, notification in zip(fresh, notifications):
+                entry.notification = notification
+            transaction.on_commit(lambda: counters.created(notifications))
+        for entry in entries:
+            entry.available_at = now + timedelta(seconds=settings.NOTIFICATION_OUTBOX_LEASE)
+        OutboxEntry.objects.bulk_update(entries, ['notification', 'available_at'])
+
+    results = _push(entries)
+
+    delivered = [e for e, ok in zip(entries, results) if ok]
+    failed = [e for e, ok in zip(entries, results) if not ok]
+    give_up = [e for e in failed if e.attempts + 1 >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS]
+    retry = [e for e in failed if e.attempts + 1 < settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS]
+
+    with transaction.atomic():
+        OutboxEntry.objects.filter(id__in=[e.id for e in delivered + give_up]).delete()
+        for entry in retry:
+            entry.attempts += 1
+            entry.available_at = now + timedelta(seconds=settings.NOTIFICATION_OUTBOX_RETRY_DELAY * 2 ** (entry.attempts - 1))
+        OutboxEntry.objects.bulk_update(retry, ['attempts', 'available_at'])
+
+    lags = [(now - e.created_at).total_seconds() for e in delivered]
+    _metrics['delivered'] += len(delivered)
+    _metrics['retried'] += len(retry)
+    _metrics['abandoned'] += len(give_up)
+    if lags:
+        _metrics['last_lag_seconds'] = max(lags)
+    if give_up:
+        logger.warning("Gave up pushing %d notification(s) after %d attempts; they stay in the notification list",
+                       len(give_up), settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS)
+    return len(delivered)
+
+
+def _push(entries):
+    """Group-send every entry concurrently; returns a success flag per entry"""
+    channel_layer = get_channel_layer()
+
+    async def send_all():
+        return await asyncio.gather(*[
+            channel_layer.group_send(f"user_{e.user_id}", {
+                "type": "send_notification",
+                "id": e.notification_id,
+                "title": e.title,
+                "message": e.message,
+                "level": e.level,
+            })
+            for e in entries
+        ], return_exceptions=True)
+
+    try:
+        outcomes = async_to_sync(send_all)()
+    except Exception as e:
+        logger.warning("Notification push failed: %s", e)
+        return [False] * len(entries)
+
+    errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    if errors:
+        logger.warning("%d of %d notification pushes failed, e.g. %s", len(errors), len(entries), errors[0])
+    return [not isinstance(outcome, Exception) for outcome in outcomes]
+
+
+def stats():
+    """Queue depth and delivery lag, for monitoring"""
+    pending = OutboxEntry.objects.aggregate(count=Count('id'), oldest=Min('created_at'))
+    oldest = pending['oldest']
+    return {
+        'pending': pending['count'],
+        'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0.0,
+        **_metrics,
+    }
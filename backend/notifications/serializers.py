@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Notification
+from .models import Notification, Broadcast
 
 class NotificationSerializer(serializers.ModelSerializer):
     created_at = serializers.SerializerMethodField()
@@ -10,3 +10,21 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     def get_created_at(self, obj):
         return obj.created_at.strftime("%b %d, %H:%M")
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Broadcast
+        fields = '__all__'
+        read_only_fields = ('created_by', 'created_at', 'status', 'recipients', 'delivered', 'cursor', 'finished_at')
+
+    def validate_bbox(self, value):
+        if value is None:
+            return value
+        try:
+            south, west, north, east = (float(v) for v in value)
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("bbox must be [south, west, north, east]")
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise serializers.ValidationError("bbox is out of range")
+        return [south, west, north, east]
@@ -1,3 +1,117 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from . import outbox
+from .models import Notification, OutboxEntry
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    NOTIFICATION_DISPATCH_ON_COMMIT=False,
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS=3,
+    NOTIFICATION_OUTBOX_RETRY_DELAY=2,
+    NOTIFICATION_OUTBOX_LEASE=30,
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('citizen', password='x')
+
+    def enqueue(self, title='Hello'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return outbox.enqueue(self.user.id, title, 'Message', 'info')
+
+    def dispatch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return outbox.dispatch_batch()
+
+    def make_due(self):
+        OutboxEntry.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+
+    def test_nothing_is_queued_when_the_change_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                outbox.enqueue(self.user.id, 'Hello', 'Message')
+                raise RuntimeError
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_delivers_and_removes_the_entry(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"user_{self.user.id}", channel)
+        self.enqueue()
+
+        self.assertEqual(self.dispatch(), 1)
+
+        notification = Notification.objects.get(user=self.user)
+        self.assertFalse(OutboxEntry.objects.exists())
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual((message['id'], message['title']), (notification.id, 'Hello'))
+
+    def test_claimed_entries_are_leased(self):
+        self.enqueue()
+        nested = []
+
+        def push(entries):
+            # A second dispatcher running while this one pushes finds nothing due
+            nested.append(outbox.dispatch_batch())
+            return [True] * len(entries)
+
+        with mock.patch.object(outbox, '_push', side_effect=push):
+            self.assertEqual(self.dispatch(), 1)
+        self.assertEqual(nested, [0])
+
+    def test_failed_push_is_retried_with_the_same_notification(self):
+        self.enqueue()
+        with mock.patch.object(outbox, '_push', side_effect=lambda entries: [False] * len(entries)):
+            started = timezone.now()
+            self.assertEqual(self.dispatch(), 0)
+
+        entry = OutboxEntry.objects.get()
+        notification_id = entry.notification_id
+        self.assertIsNotNone(notification_id)
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreaterEqual(entry.available_at, started + timedelta(seconds=2))
+        # Not due yet
+        self.assertEqual(self.dispatch(), 0)
+
+        self.make_due()
+        with mock.patch.object(outbox, '_push', side_effect=lambda entries: [True] * len(entries)) as push:
+            self.assertEqual(self.dispatch(), 1)
+        self.assertEqual(push.call_args[0][0][0].notification_id, notification_id)
+        self.assertEqual(list(Notification.objects.values_list('id', flat=True)), [notification_id])
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_retry_delay_doubles(self):
+        self.enqueue()
+        with mock.patch.object(outbox, '_push', side_effect=lambda entries: [False] * len(entries)):
+            self.dispatch()
+            self.make_due()
+            started = timezone.now()
+            self.dispatch()
+        entry = OutboxEntry.objects.get()
+        self.assertEqual(entry.attempts, 2)
+        self.assertGreaterEqual(entry.available_at, started + timedelta(seconds=4))
+
+    def test_gives_up_after_max_attempts_but_keeps_the_notification(self):
+        self.enqueue()
+        with mock.patch.object(outbox, '_push', side_effect=lambda entries: [False] * len(entries)):
+            for _ in range(3):
+                self.make_due()
+                self.dispatch()
+        self.assertFalse(OutboxEntry.objects.exists())
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def test_partial_failure_only_retries_the_failed_entries(self):
+        self.enqueue('First')
+        self.enqueue('Second')
+        with mock.patch.object(outbox, '_push', side_effect=lambda entries: [True, False]):
+            self.assertEqual(self.dispatch(), 1)
+        self.assertEqual(list(OutboxEntry.objects.values_list('title', flat=True)), ['Second'])
+        self.assertEqual(Notification.objects.count(), 2)
@@ -2,6 +2,7 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from .models import Notification
+from . import counters
 
 @login_required
 def get_notifications(request):
@@ -20,6 +21,7 @@ def get_notifications(request):
 @login_required
 def mark_notifications_read(request):
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    counters.all_read(request.user.id)
     return JsonResponse({'status': 'ok'})
 
 @login_required
@@ -1,10 +1,13 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from .models import WasteReport, SupportTicket
 from .serializers import WasteReportSerializer, SupportTicketSerializer
 from .utils import send_realtime_notification
+from . import route_cache
+from .dispatch import auto_assign
 import random
 
 class WasteReportViewSet(viewsets.ModelViewSet):
@@ -36,7 +39,8 @@ class WasteReportViewSet(viewsets.ModelViewSet):
         return queryset
 
     def perform_create(self, serializer):
-        serializer.save(citizen=self.request.user)
+        report = serializer.save(citizen=self.request.user)
+        auto_assign(report)
 
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -45,15 +49,16 @@ class WasteReportViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Not assigned to you'}, status=status.HTTP_403_FORBIDDEN)
         
         otp = str(random.randint(100000, 999999))
-        report.verification_otp = otp
-        report.save()
-
-        send_realtime_notification(
-            user=report.citizen,
-            title="Cleanup Verification OTP",
-            message=f"The worker has completed the cleanup for your report. Use OTP: {otp}",
-            level="success"
-        )
+        with transaction.atomic():
+            report.verification_otp = otp
+            report.save()
+
+            send_realtime_notification(
+                user=report.citizen,
+                title="Cleanup Verification OTP",
+                message=f"The worker has completed the cleanup for your report. Use OTP: {otp}",
+                level="success"
+            )
         return Response({'status': 'OTP generated', 'id': report.id})
 
     @action(detail=True, methods=['post'])
@@ -62,17 +67,18 @@ class WasteReportViewSet(viewsets.ModelViewSet):
         otp_input = request.data.get('otp')
         
         if report.verification_otp == otp_input:
-            report.status = "resolved"
-            report.resolved_at = timezone.now()
-            report.verification_otp = None
-            report.save()
+            with transaction.atomic():
+                report.status = "resolved"
+                report.resolved_at = timezone.now()
+                report.verification_otp = None
+                report.save()
             
-            send_realtime_notification(
-                user=report.citizen,
-                title="Cleanup Confirmed! 🎉",
-                message=f"Your waste report #{report.id} has been verified.",
-                level="success"
-            )
+                send_realtime_notification(
+                    user=report.citizen,
+                    title="Cleanup Confirmed! 🎉",
+                    message=f"Your waste report #{report.id} has been verified.",
+                    level="success"
+                )
             return Response({'status': 'verified'})
         return Response({'error': 'Invalid OTP'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -87,54 +93,37 @@ class WasteReportViewSet(viewsets.ModelViewSet):
         
         if rating:
             rating_val = int(rating)
-            report.rating = rating_val
-            report.review_text = review
-            report.save()
+            with transaction.atomic():
+                report.rating = rating_val
+                report.review_text = review
+                # Worker rating totals follow by F() increments (reports.worker_stats)
+                report.save(update_fields=['rating', 'review_text'])
 
-            # Update Worker Performance
-            worker = report.assigned_worker
-            if worker:
-                from django.db.models import Avg, Count
-                # Calculate new average
-                stats = WasteReport.objects.filter(assigned_worker=worker, rating__isnull=False).aggregate(
-                    avg_rating=Avg('rating'),
-                    count=Count('id')
-                )
-                worker.average_rating = stats['avg_rating'] or 0.0
-                worker.total_ratings = stats['count'] or 0
-                worker.save()
-
-                send_realtime_notification(
-                    user=worker,
-                    title="New Review Received! ⭐",
-                    message=f"A citizen rated your cleanup for Report #{report.id} as {rating_val}/5 stars.",
-                    level="success"
-                )
+                worker = report.assigned_worker
+                if worker:
+                    send_realtime_notification(
+                        user=worker,
+                        title="New Review Received! ⭐",
+                        message=f"A citizen rated your cleanup for Report #{report.id} as {rating_val}/5 stars.",
+                        level="success"
+                    )
 
             return Response({'status': 'rated'})
         return Response({'error': 'Rating required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
     def analytics(self, request):
-        from django.db.models import Count
-        from django.db.models.functions import TruncDay, TruncMonth
         from datetime import timedelta
         from django.utils.timezone import localdate
+        from . import daily_stats
 
-        total_reports = WasteReport.objects.count()
-        status_counts = list(WasteReport.objects.values("status").annotate(count=Count("id")))
-        severity_counts = list(WasteReport.objects.values("severity").annotate(count=Count("id")))
-        waste_type_counts = list(WasteReport.objects.values("waste_type").annotate(count=Count("id")))
+        status_counts = daily_stats.counts_by("status")
+        total_reports = sum(s["count"] for s in status_counts)
+        severity_counts = daily_stats.counts_by("severity")
+        waste_type_counts = daily_stats.counts_by("waste_type")
 
         start_date = localdate() - timedelta(days=6)
-        daily_reports = list(
-            WasteReport.objects
-            .filter(created_at__date__gte=start_date)
-            .annotate(day=TruncDay("created_at"))
-            .values("day")
-            .annotate(count=Count("id"))
-            .order_by("day")
-        )
+        daily_reports = daily_stats.daily(start_date)
 
         return Response({
             "total_reports": total_reports,
@@ -144,6 +133,46 @@ class WasteReportViewSet(viewsets.ModelViewSet):
             "daily_reports": daily_reports
         })
 
+    @action(detail=False, methods=['get'])
+    def map(self, request):
+        """
+        Clustered reports for a map viewport:
+        ?bbox=south,west,north,east&zoom=<0-20>, plus the waste map's
+        severity/status/waste_type/days filters. ?fit=1 adds the extent of
+        all matching reports.
+        """
+        from datetime import timedelta
+        from .map_clusters import cluster
+
+        try:
+            south, west, north, east = (float(v) for v in request.query_params.get('bbox', '').split(','))
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            return Response({'error': 'bbox=south,west,north,east and zoom are required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180 and 0 <= zoom <= 20):
+            return Response({'error': 'bbox or zoom is out of range'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same visibility as the waste map page: citizens see their own reports
+        reports = WasteReport.objects.all()
+        if request.user.role == 'citizen':
+            reports = reports.filter(citizen=request.user)
+        for param in ('severity', 'status', 'waste_type'):
+            if request.query_params.get(param):
+                reports = reports.filter(**{param: request.query_params[param]})
+        days = request.query_params.get('days', '')
+        if days.isdigit():
+            reports = reports.filter(created_at__gte=timezone.now() - timedelta(days=int(days)))
+
+        data = {'zoom': zoom, **cluster(reports, (south, west, north, east), zoom)}
+        if request.query_params.get('fit'):
+            # Extent of every matching report, for the map's initial view
+            from django.db.models import Max, Min
+            bounds = reports.aggregate(
+                south=Min('latitude'), west=Min('longitude'), north=Max('latitude'), east=Max('longitude'),
+            )
+            data['bounds'] = {edge: float(v) if v is not None else None for edge, v in bounds.items()}
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def optimized_route(self, request):
         from .utils import get_optimized_route, batch_reports_by_proximity
@@ -161,36 +190,17 @@ class WasteReportViewSet(viewsets.ModelViewSet):
                 'message': 'Please turn on your online status to provide your current location'
             }, status=status.HTTP_400_BAD_REQUEST)
             
-        reports = WasteReport.objects.filter(assigned_worker=user, status='assigned')
-        if not reports.exists():
+        assigned = route_cache.get_assigned(user.id, lambda: self._assigned_route_payload(user))
+        reports_with_location = assigned['with_location']
+        reports_without_location = assigned['without_location']
+
+        if not assigned['total']:
             return Response({
                 'status': 'no_jobs',
                 'message': 'No assigned reports found',
                 'batches': []
             })
-            
-        # Separate reports with and without location
-        reports_with_location = []
-        reports_without_location = []
-        
-        for r in reports:
-            if r.latitude and r.longitude:
-                reports_with_location.append({
-                    'id': r.id,
-                    'lat': float(r.latitude),
-                    'lng': float(r.longitude),
-                    'type': r.get_waste_type_display(),
-                    'severity': r.severity,
-                    'description': r.description[:50] + '...' if len(r.description) > 50 else r.description
-                })
-            else:
-                reports_without_location.append({
-                    'id': r.id,
-                    'type': r.get_waste_type_display(),
-                    'severity': r.severity,
-                    'description': r.description[:50] + '...' if len(r.description) > 50 else r.description
-                })
-        
+
         # If no reports have location data
         if not reports_with_location:
             return Response({
@@ -199,27 +209,82 @@ class WasteReportViewSet(viewsets.ModelViewSet):
                 'reports_without_location': reports_without_location,
                 'suggestion': 'Please contact admin to update report locations'
             }, status=status.HTTP_400_BAD_REQUEST)
-            
-        # Optimize route for reports with location
-        optimized = get_optimized_route(worker_lat, worker_lng, reports_with_location)
-        
-        # Group into batches
-        batches = batch_reports_by_proximity(optimized)
-        
-        response_data = {
-            'worker_location': {'lat': worker_lat, 'lng': worker_lng},
-            'batches': batches,
-            'optimized_order': [r['id'] for r in optimized],
-            'total_reports': len(reports),
-            'routable_reports': len(reports_with_location)
+
+        # ?engine=local skips OSRM
+        engine = request.query_params.get('engine')
+        if engine not in ('osrm', 'local'):
+            engine = None
+
+        def build_route():
+            # Optimize route for reports with location
+            optimized = get_optimized_route(worker_lat, worker_lng, reports_with_location, engine=engine)
+
+            # Group into batches
+            batches = batch_reports_by_proximity(optimized)
+
+            route = {
+                'batches': batches,
+                'optimized_order': [r['id'] for r in optimized],
+                'total_reports': assigned['total'],
+                'routable_reports': len(reports_with_location)
+            }
+
+            # Include warning if some reports lack location
+            if reports_without_location:
+                route['warning'] = f'{len(reports_without_location)} report(s) excluded due to missing location'
+                route['reports_without_location'] = reports_without_location
+            return route
+
+        route = route_cache.get_route(
+            user.id, [r['id'] for r in reports_with_location], worker_lat, worker_lng, build_route, engine=engine
+        )
+        return Response({'worker_location': {'lat': worker_lat, 'lng': worker_lng}, **route})
+
+    @action(detail=False, methods=['post'])
+    def plan_fleet(self, request):
+        """
+        Distribute all pending reports over online workers and route each one.
+        Dry run by default; send dry_run=false to save the assignments.
+        """
+        from .fleet import plan_pending
+
+        if request.user.role != 'admin':
+            return Response({'error': 'Admins only'}, status=status.HTTP_403_FORBIDDEN)
+
+        dry_run = str(request.data.get('dry_run', 'true')).lower() not in ('false', '0', 'no')
+        max_jobs = request.data.get('max_jobs')
+        try:
+            max_jobs = int(max_jobs) if max_jobs else None
+        except (TypeError, ValueError):
+            return Response({'error': 'max_jobs must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(plan_pending(max_jobs=max_jobs, dry_run=dry_run))
+
+    def _assigned_route_payload(self, user):
+        """The worker's assigned reports split by whether they can be routed"""
+        reports_with_location = []
+        reports_without_location = []
+
+        rows = WasteReport.objects.filter(assigned_worker=user, status='assigned').only(
+            'id', 'latitude', 'longitude', 'waste_type', 'severity', 'description'
+        )
+        for r in rows:
+            entry = {
+                'id': r.id,
+                'type': r.get_waste_type_display(),
+                'severity': r.severity,
+                'description': r.description[:50] + '...' if len(r.description) > 50 else r.description
+            }
+            if r.latitude and r.longitude:
+                reports_with_location.append({'id': r.id, 'lat': float(r.latitude), 'lng': float(r.longitude), **entry})
+            else:
+                reports_without_location.append(entry)
+
+        return {
+            'with_location': reports_with_location,
+            'without_location': reports_without_location,
+            'total': len(reports_with_location) + len(reports_without_location),
         }
-        
-        # Include warning if some reports lack location
-        if reports_without_location:
-            response_data['warning'] = f'{len(reports_without_location)} report(s) excluded due to missing location'
-            response_data['reports_without_location'] = reports_without_location
-        
-        return Response(response_data)
 
 class SupportTicketViewSet(viewsets.ModelViewSet):
     queryset = SupportTicket.objects.all()
@@ -1,21 +1,43 @@
+import asyncio
 import json
-import math
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models import F
 from reports.models import WasteReport
+from reports.geo import distances_from
+from reports.location_buffer import location_buffer
+from reports.proximity import ArrivalTracker
+from reports import wire
+from reports.presence import get_presence
+from reports.spatial import tile_of, tiles_in_bbox
+from reports.send_queue import SendQueue
+from reports.gps import FixFilter, choose_interval
+from notifications.outbox import enqueue as enqueue_notification
+from notifications.broadcasts import in_bbox, role_group
+from notifications.models import Notification
+from notifications import counters as notification_counters
 
 User = get_user_model()
 
 class LocationConsumer(AsyncWebsocketConsumer):
+    # Worker sockets open in this process, used as the load signal for GPS intervals
+    active_workers = 0
+
     async def connect(self):
         self.user = self.scope["user"]
         if not self.user.is_authenticated:
             await self.close()
             return
 
+        # Only worker accounts publish locations and appear in presence
+        if self.scope['url_route']['kwargs']['role'] == 'worker' and self.user.role != 'worker':
+            await self.close()
+            return
+
         self.role = self.scope['url_route']['kwargs']['role']
         
         # Room group name
@@ -28,23 +50,65 @@ class LocationConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        await self.accept()
+
+        if self.role == 'worker':
+            # Assigned reports are loaded once and refreshed on 'assignments_changed'
+            self.assignments_group = f"assignments_{self.user.id}"
+            self.arrivals = ArrivalTracker(self.user.id)
+            await self.channel_layer.group_add(self.assignments_group, self.channel_name)
+            await self.load_assigned_reports()
+            await get_presence().join(self.user.id)
+            self.fix_filter = FixFilter()
+            self.gps_interval = None
+            LocationConsumer.active_workers += 1
+
+        # Compact binary location frames if the client asked for them
+        self.encoder = wire.LocationEncoder() if wire.wants_binary(self.scope) else None
+        self.worker_names = {self.user.id: self.user.username}
+        self.send_queue = SendQueue()
+        subprotocol = wire.SUBPROTOCOL if wire.SUBPROTOCOL in self.scope.get('subprotocols', []) else None
+        await self.accept(subprotocol=subprotocol)
 
     async def disconnect(self, close_code):
+        if hasattr(self, 'send_queue'):
+            self.send_queue.close()
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
+        if hasattr(self, 'assignments_group'):
+            await self.channel_layer.group_discard(self.assignments_group, self.channel_name)
+        if hasattr(self, 'fix_filter'):
+            LocationConsumer.active_workers -= 1
+        if getattr(self, 'role', None) == 'worker':
+            # Other sockets of the same worker keep them online
+            last_socket = await get_presence().leave(self.user.id)
+            if last_socket and getattr(self, 'fleet_tile', None) is not None:
+                await self.channel_layer.group_send(fleet_tile_group(self.fleet_tile), {
+                    'type': 'fleet_remove', 'worker_id': self.user.id, 'tile': self.fleet_tile,
+                })
+            # Don't leave this worker's last position sitting in the buffer
+            await location_buffer.flush([self.user.id])
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            return
         data = json.loads(text_data)
         
         if self.role == 'worker' and 'lat' in data and 'lng' in data:
             lat = data['lat']
             lng = data['lng']
+
+            # Fixes within GPS noise of the last accepted one only count as a heartbeat
+            if not self.fix_filter.accept(float(lat), float(lng), data.get('accuracy'), data.get('speed')):
+                await get_presence().touch(self.user.id)
+                await self.update_gps_interval(self.nearest_open_km(lat, lng))
+                return
             
-            await self.update_worker_location(self.user.id, lat, lng)
+            # Buffered; written in bulk every LOCATION_FLUSH_INTERVAL seconds
+            await location_buffer.put(self.user.id, lat, lng)
+            await get_presence().touch(self.user.id, lat, lng)
             
             # Broadcast location update to anyone tracking this worker
             await self.channel_layer.group_send(
@@ -52,15 +116,20 @@ class LocationConsumer(AsyncWebsocketConsumer):
                 {
                     'type': 'location_update',
                     'worker_id': self.user.id,
-                    'worker_name': self.user.username,
                     'lat': lat,
                     'lng': lng
                 }
             )
 
+            await self.publish_to_fleet_map(float(lat), float(lng))
+
             # Check for proximity to assigned reports
-            await self.check_proximity(lat, lng)
+            await self.update_gps_interval(await self.check_proximity(lat, lng))
         
+        elif self.role == 'worker' and data.get('type') == 'heartbeat':
+            # Keeps a worker online while stationary or without a GPS fix
+            await get_presence().touch(self.user.id)
+
         elif self.role == 'citizen' and data.get('action') == 'track_worker':
             worker_id = data.get('worker_id')
             if worker_id:
@@ -69,41 +138,97 @@ class LocationConsumer(AsyncWebsocketConsumer):
                     self.channel_name
                 )
 
+    async def publish_to_fleet_map(self, lat, lng):
+        """Post the fix to the admin map tile it falls in, and leave the previous tile if it changed"""
+        tile = tile_of(lat, lng, settings.FLEET_MAP_TILE_ZOOM)
+        previous = getattr(self, 'fleet_tile', None)
+        await self.channel_layer.group_send(fleet_tile_group(tile), {
+            'type': 'fleet_position', 'worker_id': self.user.id, 'lat': lat, 'lng': lng, 'tile': tile,
+        })
+        if previous is not None and previous != tile:
+            await self.channel_layer.group_send(fleet_tile_group(previous), {
+                'type': 'fleet_remove', 'worker_id': self.user.id, 'tile': previous,
+            })
+        self.fleet_tile = tile
+
     async def location_update(self, event):
+        worker_id = event['worker_id']
+        if worker_id not in self.worker_names:
+            self.worker_names[worker_id] = await self.get_worker_name(worker_id)
+        # Queued rather than sent inline; a backed-up client only gets each worker's latest fix
+        self.send_queue.put(lambda: self.send_location(event), key=('location', worker_id), droppable=True)
+
+    async def send_location(self, event):
+        worker_id = event['worker_id']
+        if self.encoder is not None:
+            for frame in self.encoder.encode(worker_id, event['lat'], event['lng'], self.worker_names[worker_id]):
+                await self.send(bytes_data=frame)
+            return
+
         await self.send(text_data=json.dumps({
             'type': 'location_update',
-            'worker_id': event['worker_id'],
-            'worker_name': event['worker_name'],
+            'worker_id': worker_id,
+            'worker_name': self.worker_names[worker_id],
             'lat': event['lat'],
             'lng': event['lng']
         }))
 
+    async def assignments_changed(self, event):
+        await self.load_assigned_reports()
+
+    async def load_assigned_reports(self):
+        reports = [r for r in await self.get_assigned_reports() if r['lat'] and r['lng']]
+        self.assigned_reports = reports
+        self.assigned_lats = [float(r['lat']) for r in reports]
+        self.assigned_lngs = [float(r['lng']) for r in reports]
+        await self.arrivals.load([r['id'] for r in reports])
+
+    async def update_gps_interval(self, nearest_km):
+        """Tell the worker client how often to send fixes, whenever that changes"""
+        seconds = choose_interval(self.fix_filter.speed_kmh, nearest_km, LocationConsumer.active_workers)
+        if seconds == self.gps_interval:
+            return
+        self.gps_interval = seconds
+        message = json.dumps({'type': 'gps_interval', 'seconds': seconds})
+        self.send_queue.put(lambda: self.send(text_data=message), key=('control', 'gps_interval'))
+
+    def nearest_open_km(self, worker_lat, worker_lng):
+        """Distance (km) to the nearest assigned report not yet arrived at, or None"""
+        if not self.assigned_reports:
+            return None
+        dists = distances_from(float(worker_lat), float(worker_lng), self.assigned_lats, self.assigned_lngs)
+        return self._nearest_open(dists)
+
+    def _nearest_open(self, dists):
+        open_dists = [d for r, d in zip(self.assigned_reports, dists) if r['id'] not in self.arrivals.inside]
+        return float(min(open_dists)) if open_dists else None
+
     async def check_proximity(self, worker_lat, worker_lng):
-        reports = await self.get_assigned_reports()
+        """Announce arrivals; returns the distance (km) to the nearest assigned report not yet arrived at, or None"""
+        reports = self.assigned_reports
+        if not reports:
+            return None
+
+        dists = distances_from(float(worker_lat), float(worker_lng), self.assigned_lats, self.assigned_lngs)
+        arrived = set(await self.arrivals.update([r['id'] for r in reports], dists))
         for report in reports:
-            if report['lat'] and report['lng']:
-                dist = self.calculate_distance(worker_lat, worker_lng, float(report['lat']), float(report['lng']))
-                if dist < 0.1: # 100 meters
-                    # Send real-time notification to the specific citizen
-                    await self.channel_layer.group_send(
-                        f"user_{report['citizen_id']}",
-                        {
-                            "type": "send_notification",
-                            "title": "Worker Arriving! 🚛",
-                            "message": f"Your assigned worker {self.user.username} is arriving at the location for Waste Report #{report['id']}.",
-                            "level": "info"
-                        }
-                    )
-
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        R = 6371 # Earth radius in km
-        dLat = math.radians(lat2 - lat1)
-        dLon = math.radians(lon2 - lon1)
-        a = math.sin(dLat / 2) * math.sin(dLat / 2) + \
-            math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-            math.sin(dLon / 2) * math.sin(dLon / 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
+            if report['id'] not in arrived:
+                continue
+            await self.save_notification(
+                report['citizen_id'],
+                "Worker Arriving! 🚛",
+                f"Your assigned worker {self.user.username} is arriving at the location for Waste Report #{report['id']}."
+            )
+        return self._nearest_open(dists)
+
+    @database_sync_to_async
+    def save_notification(self, user_id, title, message):
+        enqueue_notification(user_id, title, message)
+
+    @database_sync_to_async
+    def get_worker_name(self, worker_id):
+        # Looked up once per tracked worker per connection instead of riding on every fix
+        return User.objects.filter(id=worker_id).values_list('username', flat=True).first() or ''
 
     @database_sync_to_async
     def get_assigned_reports(self):
@@ -112,13 +237,139 @@ class LocationConsumer(AsyncWebsocketConsumer):
             status='assigned'
         ).values('id', 'citizen_id', 'latitude', 'longitude').annotate(lat=F('latitude'), lng=F('longitude')))
 
+def fleet_tile_group(tile):
+    return f"fleet_tile_{settings.FLEET_MAP_TILE_ZOOM}_{tile[0]}_{tile[1]}"
+
+
+class FleetMapConsumer(AsyncWebsocketConsumer):
+    """
+    Live worker positions for the admin map. The client sends its viewport
+    ({"action": "viewport", "bbox": [south, west, north, east]}) and is
+    subscribed to the map tiles covering it; updates from those tiles are
+    batched into at most FLEET_MAP_FPS frames per second:
+    {"type": "fleet_frame", "positions": [[id, lat, lng], ...], "removed": [id, ...],
+     "names": {id: username}}, with each worker's name sent once per connection.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated or self.user.role != 'admin':
+            await self.close()
+            return
+
+        self.tiles = set()
+        self.worker_tiles = {}
+        self.pending = {}
+        self.removed = set()
+        self.named = set()
+        self.flusher = None
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        for tile in getattr(self, 'tiles', ()):
+            await self.channel_layer.group_discard(fleet_tile_group(tile), self.channel_name)
+        if getattr(self, 'flusher', None) is not None:
+            self.flusher.cancel()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            return
+        data = json.loads(text_data)
+        if data.get('action') != 'viewport':
+            return
+
+        try:
+            south, west, north, east = (float(v) for v in data['bbox'])
+        except (KeyError, TypeError, ValueError):
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'bbox must be [south, west, north, east]'}))
+            return
+
+        tiles = tiles_in_bbox(south, west, north, east, settings.FLEET_MAP_TILE_ZOOM, limit=settings.FLEET_MAP_MAX_TILES)
+        if tiles is None:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Viewport too large, zoom in to see live workers'}))
+        tiles = set(tiles or ())
+
+        added, dropped = tiles - self.tiles, self.tiles - tiles
+        for tile in dropped:
+            await self.channel_layer.group_discard(fleet_tile_group(tile), self.channel_name)
+        for tile in added:
+            await self.channel_layer.group_add(fleet_tile_group(tile), self.channel_name)
+        self.tiles = tiles
+
+        # Workers that scrolled out of view, then a snapshot of the newly visible tiles
+        for wid, tile in list(self.worker_tiles.items()):
+            if tile in dropped:
+                self._remove(wid)
+        if added:
+            for wid, entry in (await sync_to_async(get_presence().online)()).items():
+                if entry['lat'] is None:
+                    continue
+                tile = tile_of(entry['lat'], entry['lng'], settings.FLEET_MAP_TILE_ZOOM)
+                if tile in added:
+                    self._position(wid, entry['lat'], entry['lng'], tile)
+        self._schedule()
+
+    async def fleet_position(self, event):
+        tile = tuple(event['tile'])
+        if tile in self.tiles:
+            self._position(event['worker_id'], event['lat'], event['lng'], tile)
+            self._schedule()
+
+    async def fleet_remove(self, event):
+        # Ignore if a position from the worker's new tile already arrived
+        if self.worker_tiles.get(event['worker_id']) == tuple(event['tile']):
+            self._remove(event['worker_id'])
+            self._schedule()
+
+    def _position(self, worker_id, lat, lng, tile):
+        self.worker_tiles[worker_id] = tile
+        self.pending[worker_id] = (lat, lng)
+        self.removed.discard(worker_id)
+
+    def _remove(self, worker_id):
+        self.worker_tiles.pop(worker_id, None)
+        self.pending.pop(worker_id, None)
+        self.removed.add(worker_id)
+
+    def _schedule(self):
+        if (self.pending or self.removed) and (self.flusher is None or self.flusher.done()):
+            self.flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(1.0 / settings.FLEET_MAP_FPS)
+        positions, self.pending = self.pending, {}
+        removed, self.removed = self.removed, set()
+
+        unnamed = [wid for wid in positions if wid not in self.named]
+        names = await self.get_worker_names(unnamed) if unnamed else {}
+        self.named.update(names)
+
+        await self.send(text_data=json.dumps({
+            'type': 'fleet_frame',
+            'positions': [[wid, lat, lng] for wid, (lat, lng) in positions.items()],
+            'removed': list(removed),
+            'names': names,
+        }))
+        # Anything that arrived while sending goes out in the next frame
+        if self.pending or self.removed:
+            self.flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
     @database_sync_to_async
-    def update_worker_location(self, user_id, lat, lng):
-        User.objects.filter(id=user_id).update(
-            latitude=lat,
-            longitude=lng,
-            last_location_update=timezone.now()
-        )
+    def get_worker_names(self, worker_ids):
+        return dict(User.objects.filter(id__in=worker_ids).values_list('id', 'username'))
+
+
+_replay_slots = {}
+
+
+def replay_slots():
+    """Per-event-loop cap on concurrent replay queries (NOTIFICATION_REPLAY_CONCURRENCY)"""
+    loop = asyncio.get_running_loop()
+    if loop not in _replay_slots:
+        _replay_slots.clear()
+        _replay_slots[loop] = asyncio.Semaphore(settings.NOTIFICATION_REPLAY_CONCURRENCY)
+    return _replay_slots[loop]
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -128,24 +379,113 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return
 
         self.user_group = f"user_{self.user.id}"
+        self.role_group = role_group(self.user.role)
+        self.send_queue = SendQueue()
         
         await self.channel_layer.group_add(
             self.user_group,
             self.channel_name
         )
+        # Broadcasts arrive once per role group, not per user
+        await self.channel_layer.group_add(self.role_group, self.channel_name)
+        self.places = None
+        self.replayed_upto = 0
         await self.accept()
 
+        # Catch up on anything sent while the client was away (?last_id=<newest id it has>)
+        last_seen = parse_qs(self.scope.get('query_string', b'').decode()).get('last_id', [''])[0]
+        if last_seen.isdigit():
+            await self.replay(int(last_seen))
+
+    async def replay(self, last_seen):
+        """
+        Send notifications newer than last_seen in one 'replay' message. The
+        rows are looked up in the database, not the cache, since the
+        dispatcher creates them in another process; a reconnect storm after a
+        deploy queues for a few query slots per process.
+        """
+        async with replay_slots():
+            rows, unread = await self.get_newer_notifications(last_seen)
+        if not rows:
+            return
+        # Live pushes for rows already replayed are skipped
+        self.replayed_upto = rows[-1]['id']
+        message = json.dumps({
+            'type': 'replay',
+            'notifications': rows,
+            'last_id': rows[-1]['id'],
+            'unread': unread,
+            'more': len(rows) == settings.NOTIFICATION_REPLAY_LIMIT,
+        })
+        self.send_queue.put(lambda: self.send(text_data=message))
+
+    @database_sync_to_async
+    def get_newer_notifications(self, last_seen):
+        rows = list(
+            Notification.objects.filter(user_id=self.user.id, id__gt=last_seen)
+            .order_by('id')
+            .values('id', 'title', 'message', 'is_read', 'created_at')[:settings.NOTIFICATION_REPLAY_LIMIT]
+        )
+        for row in rows:
+            row['created_at'] = row['created_at'].strftime("%b %d, %H:%M")
+        return rows, notification_counters.unread_count(self.user.id)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            return
+        data = json.loads(text_data)
+        # Acknowledgements mark notifications read without a separate HTTP call
+        if data.get('action') == 'ack':
+            ids = [i for i in data.get('ids', []) if isinstance(i, int)]
+            if ids:
+                await self.mark_read(ids)
+        elif data.get('action') == 'ack_all':
+            await self.mark_read(None)
+
+    @database_sync_to_async
+    def mark_read(self, ids):
+        unread = Notification.objects.filter(user_id=self.user.id, is_read=False)
+        if ids is None:
+            unread.update(is_read=True)
+            notification_counters.all_read(self.user.id)
+        else:
+            notification_counters.marked_read(self.user.id, unread.filter(id__in=ids).update(is_read=True))
+
     async def disconnect(self, close_code):
+        if hasattr(self, 'send_queue'):
+            self.send_queue.close()
         if hasattr(self, 'user_group'):
             await self.channel_layer.group_discard(
                 self.user_group,
                 self.channel_name
             )
+            await self.channel_layer.group_discard(self.role_group, self.channel_name)
 
     async def send_notification(self, event):
-        await self.send(text_data=json.dumps({
+        if event.get('id') and event['id'] <= self.replayed_upto:
+            return
+        # Never dropped, but queued so a slow client doesn't stall the channel layer
+        self.send_queue.put(lambda: self.send(text_data=json.dumps({
             'type': 'notification',
+            'id': event.get('id'),
             'title': event.get('title', 'New Notification'),
             'message': event['message'],
             'level': event.get('level', 'info')
-        }))
+        })))
+
+    async def broadcast_notification(self, event):
+        if event.get('bbox'):
+            # Same region rule as broadcasts.segment_users: own position or any report in the box
+            if self.places is None:
+                self.places = await self.get_places()
+            if not any(in_bbox(lat, lng, event['bbox']) for lat, lng in self.places):
+                return
+        await self.send_notification(event)
+
+    @database_sync_to_async
+    def get_places(self):
+        user = User.objects.filter(id=self.user.id).values_list('latitude', 'longitude').first()
+        reports = WasteReport.objects.filter(
+            citizen_id=self.user.id, latitude__isnull=False, longitude__isnull=False
+        ).values_list('latitude', 'longitude')
+        return [(float(lat), float(lng)) for lat, lng in [user or (None, None), *reports] if lat is not None and lng is not None]
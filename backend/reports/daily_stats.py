@@ -0,0 +1,91 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from . import dashboard_stats
+from .models import ReportDailyStat, WasteReport
+
+# ReportDailyStat key columns, as WasteReport attribute names
+DIMENSIONS = ('status', 'severity', 'waste_type')
+
+
+def _key(created_at, values):
+    return (timezone.localdate(created_at),) + tuple(values[d] for d in DIMENSIONS)
+
+
+def _add(key, delta):
+    day, status, severity, waste_type = key
+    rows = ReportDailyStat.objects.filter(day=day, status=status, severity=severity, waste_type=waste_type)
+    if rows.update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ReportDailyStat.objects.create(day=day, status=status, severity=severity, waste_type=waste_type, count=delta)
+    except IntegrityError:
+        # Another transaction created the row first
+        rows.update(count=F('count') + delta)
+
+
+def report_saved(report, stored):
+    """
+    Move the report's count to its new key. `stored` is the row as it was
+    before this save (see signals.stored_row), None for a new report.
+    """
+    old_key = _key(stored['created_at'], stored) if stored else None
+    new_key = _key(report.created_at, {d: getattr(report, d) for d in DIMENSIONS})
+    if old_key != new_key:
+        if old_key is not None:
+            _add(old_key, -1)
+        _add(new_key, 1)
+
+
+def report_deleted(stored):
+    if stored:
+        _add(_key(stored['created_at'], stored), -1)
+
+
+def rebuild():
+    """Recount everything from WasteReport in one pass; returns the number of rollup rows"""
+    grouped = (
+        WasteReport.objects
+        .annotate(day=TruncDate('created_at'))
+        .values('day', *DIMENSIONS)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        ReportDailyStat.objects.all().delete()
+        rows = ReportDailyStat.objects.bulk_create([ReportDailyStat(**row) for row in grouped.iterator()], batch_size=1000)
+        transaction.on_commit(dashboard_stats.invalidate)
+    return len(rows)
+
+
+def counts_by(field):
+    """[{field: value, 'count': n}, ...] over all history, like values(field).annotate(Count)"""
+    return list(
+        ReportDailyStat.objects.values(field)
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by(field)
+    )
+
+
+def daily(since):
+    return list(
+        ReportDailyStat.objects.filter(day__gte=since)
+        .values('day')
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('day')
+    )
+
+
+def monthly():
+    return list(
+        ReportDailyStat.objects.annotate(month=TruncMonth('day'))
+        .values('month')
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('month')
+    )
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .models import ReportDailyStat, WasteReport
+
+# Report counters for the dashboards, one conditional-aggregate query per
+# scope (a citizen, a worker, or the whole site), cached for
+# DASHBOARD_STATS_TTL seconds. The WasteReport signal handlers drop the
+# affected scopes when a report is saved or deleted.
+
+STATUSES = [s for s, _ in WasteReport.STATUS_CHOICES]
+
+
+def _key(scope, user_id=None):
+    return f"dash_stats:{scope}:{user_id}" if user_id else f"dash_stats:{scope}"
+
+
+def _cached(key, compute):
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, settings.DASHBOARD_STATS_TTL)
+    return stats
+
+
+def _by_status(field='id', aggregate=Count):
+    return {s: aggregate(field, filter=Q(status=s)) for s in STATUSES}
+
+
+def citizen(user_id):
+    """total, pending, assigned and resolved for a citizen's own reports"""
+    return _cached(_key('citizen', user_id), lambda: WasteReport.objects.filter(citizen_id=user_id).aggregate(
+        total=Count('id'),
+        **_by_status(),
+    ))
+
+
+def worker(user_id):
+    """total, pending, assigned and resolved for the reports assigned to a worker"""
+    return _cached(_key('worker', user_id), lambda: WasteReport.objects.filter(assigned_worker_id=user_id).aggregate(
+        total=Count('id'),
+        **_by_status(),
+    ))
+
+
+def site():
+    """Site-wide report totals, from the daily rollup, plus the number of accounts"""
+    def compute():
+        stats = ReportDailyStat.objects.aggregate(total=Sum('count'), **_by_status('count', Sum))
+        stats = {name: value or 0 for name, value in stats.items()}
+        stats['users'] = get_user_model().objects.count()
+        return stats
+    return _cached(_key('site'), compute)
+
+
+def invalidate(citizen_ids=(), worker_ids=(), site_wide=True):
+    keys = [_key('citizen', uid) for uid in citizen_ids if uid] + [_key('worker', uid) for uid in worker_ids if uid]
+    if site_wide:
+        keys.append(_key('site'))
+    cache.delete_many(keys)
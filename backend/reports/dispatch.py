@@ -0,0 +1,141 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+
+from .geo import haversine_km
+from .models import WasteReport
+from .presence import get_presence
+from .spatial import GridIndex
+from .utils import send_realtime_notification
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+INDEX_CELL_KM = 1.0
+NEUTRAL_RATING = 3.0
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def worker_index():
+    """
+    Grid index of online workers' live positions (from the presence
+    registry), rebuilt at most every AUTO_DISPATCH_INDEX_TTL seconds.
+    Values are (lat, lng, rating).
+    """
+    global _index, _index_built_at
+    with _index_lock:
+        if _index is not None and time.monotonic() - _index_built_at < settings.AUTO_DISPATCH_INDEX_TTL:
+            return _index
+
+        live = {wid: entry for wid, entry in get_presence().online().items() if entry['lat'] is not None}
+        rows = [
+            (wid, live[wid]['lat'], live[wid]['lng'], rating, n_ratings)
+            for wid, rating, n_ratings in User.objects.filter(
+                id__in=list(live), role='worker', is_active=True,
+            ).values_list('id', 'average_rating', 'total_ratings')
+        ]
+
+        index = GridIndex(INDEX_CELL_KM, ref_lat=max((abs(float(r[1])) for r in rows), default=0.0))
+        for wid, lat, lng, rating, n_ratings in rows:
+            lat, lng = float(lat), float(lng)
+            index.insert(wid, lat, lng, (lat, lng, rating if n_ratings else NEUTRAL_RATING))
+
+        _index, _index_built_at = index, time.monotonic()
+        return index
+
+
+def nearby_workers(lat, lng, radius_km, wanted):
+    """
+    [(worker_id, distance_km, rating)] within radius_km, walking the grid
+    outwards until at least `wanted` are found (plus one more ring, since a
+    worker in the next ring can be closer than one in the corner of this one).
+    """
+    index = worker_index()
+    max_ring = math.ceil(radius_km / INDEX_CELL_KM) + 1
+    found = []
+    stop_after = max_ring
+    for ring in range(max_ring + 1):
+        for wid, (wlat, wlng, rating) in index.ring(lat, lng, ring):
+            dist = haversine_km(lat, lng, wlat, wlng)
+            if dist <= radius_km:
+                found.append((wid, dist, rating))
+        if len(found) >= wanted and stop_after == max_ring:
+            stop_after = ring + 1
+        if ring >= stop_after:
+            break
+    return found
+
+
+def choose_worker(lat, lng):
+    """The best online worker for a job at (lat, lng), or None"""
+    candidates = nearby_workers(lat, lng, settings.AUTO_DISPATCH_RADIUS_KM, settings.AUTO_DISPATCH_CANDIDATES)
+    if not candidates:
+        return None
+
+    loads = dict(
+        WasteReport.objects.filter(
+            assigned_worker_id__in=[wid for wid, _, _ in candidates], status='assigned'
+        ).values_list('assigned_worker_id').annotate(n=Count('id'))
+    )
+
+    best, best_score = None, None
+    for wid, dist, rating in candidates:
+        load = loads.get(wid, 0)
+        if load >= settings.FLEET_MAX_JOBS_PER_WORKER:
+            continue
+        score = (
+            dist
+            + settings.AUTO_DISPATCH_LOAD_KM * load
+            + settings.AUTO_DISPATCH_RATING_KM * (5 - rating)
+        )
+        if best_score is None or score < best_score:
+            best, best_score = wid, score
+    return best
+
+
+def auto_assign(report):
+    """
+    Assign a freshly created pending report to the best nearby online worker
+    when AUTO_DISPATCH_ENABLED. Returns the worker, or None if the report was
+    left for manual assignment, including when dispatch itself fails.
+    """
+    if not settings.AUTO_DISPATCH_ENABLED:
+        return None
+    if report.status != 'pending' or report.latitude is None or report.longitude is None:
+        return None
+
+    try:
+        worker_id = choose_worker(float(report.latitude), float(report.longitude))
+        if worker_id is None:
+            return None
+
+        worker = User.objects.get(id=worker_id)
+        with transaction.atomic():
+            report.assigned_worker = worker
+            report.status = 'assigned'
+            report.save(update_fields=['assigned_worker', 'status'])
+
+            # Notify Worker
+            send_realtime_notification(
+                user=worker,
+                title="Job Assigned 🚛",
+                message=f"You have been assigned to Waste Report #{report.id}.",
+                level="info"
+            )
+    except Exception:
+        # The report is already saved; don't fail the citizen's request (a retry would duplicate it)
+        logger.exception("Auto-dispatch failed for report %s; leaving it pending", report.id)
+        report.assigned_worker = None
+        report.status = 'pending'
+        return None
+    return worker
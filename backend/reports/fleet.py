@@ -0,0 +1,160 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .geo import distance_matrix
+from .models import WasteReport
+from .presence import get_presence
+from .tsp import solve_route
+from .utils import send_realtime_notification
+
+User = get_user_model()
+
+SEVERITY_WEIGHTS = {'high': 3, 'medium': 2, 'low': 1}
+
+
+def plan_fleet(reports, workers, max_jobs=None, balance_km=None, time_budget=None):
+    """
+    Spread pending reports over workers and route each worker.
+
+    reports: [{'id', 'lat', 'lng', 'severity'}] to be assigned
+    workers: [{'id', 'lat', 'lng', 'jobs': [{'id', 'lat', 'lng', ...}]}] where
+             'jobs' are reports the worker already has
+    Reports are taken most severe first and, within a severity, in order of
+    distance to their closest worker. Each goes to the worker with the lowest
+    distance + balance_km * current job count among those below max_jobs.
+    Returns {'routes': {worker_id: [stops in order]}, 'new': {worker_id: [report ids]},
+             'unassigned': [report ids]}.
+    """
+    max_jobs = max_jobs or settings.FLEET_MAX_JOBS_PER_WORKER
+    balance_km = settings.FLEET_BALANCE_KM if balance_km is None else balance_km
+    time_budget = settings.FLEET_ROUTE_TIME_BUDGET if time_budget is None else time_budget
+
+    if not workers:
+        return {'routes': {}, 'new': {}, 'unassigned': [r['id'] for r in reports]}
+
+    new = {w['id']: [] for w in workers}
+
+    dist = distance_matrix(
+        [r['lat'] for r in reports], [r['lng'] for r in reports],
+        [w['lat'] for w in workers], [w['lng'] for w in workers],
+    )
+    load = np.array([len(w['jobs']) for w in workers], dtype=float)
+    weight = np.array([SEVERITY_WEIGHTS.get(r.get('severity'), 2) for r in reports])
+    order = np.lexsort((dist.min(axis=1), -weight))
+
+    unassigned = []
+    for i in order:
+        cost = dist[i] + balance_km * load
+        cost[load >= max_jobs] = np.inf
+        w = int(np.argmin(cost))
+        if not np.isfinite(cost[w]):
+            unassigned.append(reports[i]['id'])
+            continue
+        new[workers[w]['id']].append(i)
+        load[w] += 1
+
+    routes = {}
+    busy = [w for w in workers if w['jobs'] or new[w['id']]]
+    per_worker_budget = time_budget / max(len(busy), 1)
+    for w in workers:
+        stops = list(w['jobs']) + [reports[i] for i in new[w['id']]]
+        routes[w['id']] = solve_route(w['lat'], w['lng'], stops, time_budget=per_worker_budget) if stops else []
+
+    return {
+        'routes': routes,
+        'new': {wid: [reports[i]['id'] for i in idx] for wid, idx in new.items()},
+        'unassigned': unassigned,
+    }
+
+
+def online_workers():
+    """Workers live in the presence registry with a known position, with their current jobs"""
+    live = {wid: entry for wid, entry in get_presence().online().items() if entry['lat'] is not None}
+    rows = User.objects.filter(
+        id__in=list(live), role='worker', is_active=True,
+    ).values_list('id', 'username')
+
+    workers = {
+        wid: {'id': wid, 'username': name, 'lat': live[wid]['lat'], 'lng': live[wid]['lng'], 'jobs': []}
+        for wid, name in rows
+    }
+    jobs = WasteReport.objects.filter(
+        assigned_worker_id__in=list(workers), status='assigned',
+        latitude__isnull=False, longitude__isnull=False,
+    ).values_list('id', 'assigned_worker_id', 'latitude', 'longitude', 'severity')
+    for rid, wid, lat, lng, severity in jobs:
+        workers[wid]['jobs'].append({'id': rid, 'lat': float(lat), 'lng': float(lng), 'severity': severity})
+    return list(workers.values())
+
+
+def pending_reports():
+    rows = WasteReport.objects.filter(
+        status='pending', latitude__isnull=False, longitude__isnull=False,
+    ).values_list('id', 'latitude', 'longitude', 'severity')
+    return [{'id': rid, 'lat': float(lat), 'lng': float(lng), 'severity': severity} for rid, lat, lng, severity in rows]
+
+
+def plan_pending(max_jobs=None, dry_run=True):
+    """
+    Plan every pending report with a location over the online fleet.
+    Unless dry_run, the assignments are saved and each worker gets one
+    "Job Assigned" notification.
+    """
+    started = time.perf_counter()
+    workers = online_workers()
+    reports = pending_reports()
+    plan = plan_fleet(reports, workers, max_jobs=max_jobs)
+
+    assigned = 0
+    if not dry_run:
+        assigned = apply_plan(plan['new'])
+
+    names = {w['id']: w['username'] for w in workers}
+    return {
+        'dry_run': dry_run,
+        'workers': [
+            {
+                'worker_id': wid,
+                'worker_name': names[wid],
+                'new_reports': plan['new'][wid],
+                'route': [stop['id'] for stop in route],
+            }
+            for wid, route in plan['routes'].items()
+        ],
+        'unassigned': plan['unassigned'],
+        'pending_reports': len(reports),
+        'online_workers': len(workers),
+        'assigned': assigned,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def apply_plan(new_assignments):
+    """Assign reports per {worker_id: [report ids]}; skips reports no longer pending"""
+    assigned = {}
+    with transaction.atomic():
+        for worker_id, report_ids in new_assignments.items():
+            if not report_ids:
+                continue
+            # Saved one by one so the WasteReport signal handlers see each change
+            reports = WasteReport.objects.select_for_update().filter(id__in=report_ids, status='pending')
+            for report in reports:
+                report.assigned_worker_id = worker_id
+                report.status = 'assigned'
+                report.save(update_fields=['assigned_worker', 'status'])
+                assigned.setdefault(worker_id, []).append(report.id)
+
+        for worker in User.objects.filter(id__in=list(assigned)):
+            ids = assigned[worker.id]
+            send_realtime_notification(
+                user=worker,
+                title="New Jobs Assigned 🚛",
+                message=f"You have been assigned {len(ids)} new Waste Report(s): " + ", ".join(f"#{i}" for i in ids) + ".",
+                level="info"
+            )
+    return sum(len(ids) for ids in assigned.values())
+
@@ -0,0 +1,75 @@
+"""
+Shared great-circle distance helpers.
+
+All functions take degrees and return kilometres. The array versions accept
+anything NumPy can broadcast, so a single point against N points gives a
+vector and N points against M points (via distance_matrix) gives an N x M
+matrix.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Element-wise haversine distance between two sets of points"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distance between two single points, as a plain float"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def distances_from(lat, lng, lats, lngs):
+    """Vector of distances from one point to each of `lats`/`lngs`"""
+    return haversine(lat, lng, lats, lngs)
+
+
+def distance_matrix(lats, lngs, lats2=None, lngs2=None):
+    """Pairwise distances; compares the set with itself when no second set is given"""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    if lats2 is None:
+        lats2, lngs2 = lats, lngs
+    lats2 = np.asarray(lats2, dtype=float)
+    lngs2 = np.asarray(lngs2, dtype=float)
+    return haversine(lats[:, None], lngs[:, None], lats2[None, :], lngs2[None, :])
+
+
+def to_unit_vectors(lats, lngs):
+    """(N, 3) array of points on the unit sphere"""
+    lat_r = np.radians(np.asarray(lats, dtype=float))
+    lng_r = np.radians(np.asarray(lngs, dtype=float))
+    cos_lat = np.cos(lat_r)
+    return np.column_stack((cos_lat * np.cos(lng_r), cos_lat * np.sin(lng_r), np.sin(lat_r)))
+
+
+def nearest_neighbour_order(lat, lng, lats, lngs):
+    """
+    Greedy nearest-neighbour tour starting at (lat, lng).
+
+    Returns the visiting order as a list of indices into `lats`/`lngs`.
+    Ties are broken by the lowest index.
+    """
+    points = to_unit_vectors(lats, lngs)
+    n = len(points)
+    # Great-circle distance shrinks as the dot product of unit vectors grows,
+    # so each step is one matrix-vector product and an argmax.
+    remaining = np.arange(n)
+    current = to_unit_vectors([lat], [lng])[0]
+    order = []
+    for _ in range(n):
+        pos = int(np.argmax(points @ current))
+        nxt = int(remaining[pos])
+        order.append(nxt)
+        current = points[pos]
+        points = np.delete(points, pos, axis=0)
+        remaining = np.delete(remaining, pos)
+    return order
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+
+from .geo import haversine_km
+
+# Beyond this the client's reported accuracy isn't trusted to widen the dead-band
+MAX_ACCURACY_M = 50.0
+
+
+def choose_interval(speed_kmh, nearest_km, active_workers):
+    """
+    Seconds between GPS fixes for a worker client.
+
+    `nearest_km` is the distance to the nearest assigned report the worker
+    hasn't arrived at yet. A worker moving towards one within GPS_APPROACH_KM
+    reports at GPS_INTERVAL_MIN so arrival is detected promptly. Otherwise a
+    stationary worker reports at GPS_INTERVAL_IDLE, and a moving one about
+    every GPS_TARGET_SPACING_M metres, within [GPS_INTERVAL_MIN,
+    GPS_INTERVAL_MAX]. Away from a job the interval is stretched in
+    proportion to how far this process is over GPS_LOAD_SOFT_LIMIT connected
+    workers, up to the idle interval.
+    """
+    if speed_kmh < settings.GPS_IDLE_SPEED_KMH:
+        interval = settings.GPS_INTERVAL_IDLE
+    elif nearest_km is not None and nearest_km <= settings.GPS_APPROACH_KM:
+        return settings.GPS_INTERVAL_MIN
+    else:
+        interval = settings.GPS_TARGET_SPACING_M / (speed_kmh / 3.6)
+        interval = min(max(interval, settings.GPS_INTERVAL_MIN), settings.GPS_INTERVAL_MAX)
+
+    load = max(1.0, active_workers / settings.GPS_LOAD_SOFT_LIMIT)
+    # Never beyond the idle interval, which PRESENCE_TTL is sized to cover
+    return int(round(min(interval * load, settings.GPS_INTERVAL_IDLE)))
+
+
+class FixFilter:
+    """
+    Server-side dead-band for one worker's fixes: a fix within GPS noise of
+    the last accepted one (GPS_DEADBAND_M, or the fix's own accuracy up to
+    50 m) is rejected. Also tracks the worker's speed since the last
+    accepted fix.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.last = None
+        self.last_at = None
+        self.speed_kmh = 0.0
+        self.accepted = 0
+        self.rejected = 0
+
+    def accept(self, lat, lng, accuracy=None, speed=None):
+        """
+        True if the fix should be stored and broadcast. `speed` is the
+        client's own reading in m/s, preferred over the estimate when given.
+        """
+        now = self.clock()
+        # Distance and time are both measured from the last accepted fix
+        elapsed = now - self.last_at if self.last_at is not None else 0.0
+        moved_km = haversine_km(self.last[0], self.last[1], lat, lng) if self.last is not None else None
+        if speed is not None:
+            self.speed_kmh = max(float(speed), 0.0) * 3.6
+        elif moved_km is not None and elapsed > 0:
+            self.speed_kmh = moved_km / elapsed * 3600
+
+        if moved_km is not None:
+            noise_m = settings.GPS_DEADBAND_M
+            if accuracy is not None:
+                noise_m = max(noise_m, min(float(accuracy), MAX_ACCURACY_M))
+            if moved_km * 1000 < noise_m:
+                self.rejected += 1
+                return False
+
+        self.last = (lat, lng)
+        self.last_at = now
+        self.accepted += 1
+        return True
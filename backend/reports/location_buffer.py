@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WorkerLocation
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+class LocationBuffer:
+    """
+    Write-behind buffer for worker GPS fixes.
+
+    Keeps only the latest fix per worker and writes them all with one
+    bulk_update every `interval` seconds from a task on the running event
+    loop. With interval 0 every fix is written straight away. Every fix
+    (at most one per LOCATION_HISTORY_MIN_INTERVAL per worker) is also
+    appended to WorkerLocation with one bulk_create in the same flush.
+    """
+
+    def __init__(self, interval=None):
+        self._interval = interval
+        self._latest = {}
+        self._history = {}
+        self._history_last = {}
+        self._task = None
+        self.writes = 0
+        self.coalesced = 0
+
+    @property
+    def interval(self):
+        return settings.LOCATION_FLUSH_INTERVAL if self._interval is None else self._interval
+
+    async def put(self, user_id, lat, lng, at=None):
+        if user_id in self._latest:
+            self.coalesced += 1
+        at = at or timezone.now()
+        self._latest[user_id] = (lat, lng, at)
+        last = self._history_last.get(user_id)
+        if last is None or (at - last).total_seconds() >= settings.LOCATION_HISTORY_MIN_INTERVAL:
+            self._history.setdefault(user_id, []).append((at, lat, lng))
+            self._history_last[user_id] = at
+        if self.interval <= 0:
+            await self.flush()
+        else:
+            self._ensure_task()
+
+    async def flush(self, user_ids=None):
+        """Write buffered fixes, for all workers or just `user_ids`"""
+        if user_ids is None:
+            batch, self._latest = self._latest, {}
+            history, self._history = self._history, {}
+        else:
+            batch = {uid: self._latest.pop(uid) for uid in user_ids if uid in self._latest}
+            history = {uid: self._history.pop(uid) for uid in user_ids if uid in self._history}
+        if not batch:
+            return
+        try:
+            await database_sync_to_async(self._write)(batch, history)
+        except Exception:
+            # Put the fixes back for the next attempt unless newer ones arrived meanwhile
+            for uid, fix in batch.items():
+                self._latest.setdefault(uid, fix)
+            for uid, points in history.items():
+                self._history[uid] = points + self._history.get(uid, [])
+            raise
+
+    def _write(self, batch, history):
+        users = [
+            User(id=uid, latitude=lat, longitude=lng, last_location_update=at)
+            for uid, (lat, lng, at) in batch.items()
+        ]
+        points = [
+            WorkerLocation(worker_id=uid, recorded_at=at, latitude=float(lat), longitude=float(lng))
+            for uid, fixes in history.items()
+            for at, lat, lng in fixes
+        ]
+        with transaction.atomic():
+            User.objects.bulk_update(users, ['latitude', 'longitude', 'last_location_update'], batch_size=500)
+            WorkerLocation.objects.bulk_create(points, batch_size=1000)
+        self.writes += 1
+
+    def _ensure_task(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self._latest:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing %d buffered worker locations failed", len(self._latest))
+
+
+location_buffer = LocationBuffer()
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .geo import haversine
+from .models import WorkerLocation
+
+# (resolution in seconds, resolution the points are folded into, age setting in hours)
+DOWNSAMPLE_STEPS = (
+    (0, 30, 'LOCATION_HISTORY_RAW_HOURS'),
+    (30, 300, 'LOCATION_HISTORY_30S_HOURS'),
+)
+
+
+def points(worker_id, start=None, end=None):
+    """[(recorded_at, lat, lng)] for a worker in time order, optionally within [start, end)"""
+    qs = WorkerLocation.objects.filter(worker_id=worker_id)
+    if start is not None:
+        qs = qs.filter(recorded_at__gte=start)
+    if end is not None:
+        qs = qs.filter(recorded_at__lt=end)
+    return list(qs.order_by('recorded_at').values_list('recorded_at', 'latitude', 'longitude'))
+
+
+def thin(track, max_points):
+    """Evenly pick at most max_points from a track, always keeping the last point"""
+    if max_points <= 0 or len(track) <= max_points:
+        return track
+    idx = np.linspace(0, len(track) - 1, max_points).round().astype(int)
+    return [track[i] for i in idx]
+
+
+def summarize(track, max_gap=None):
+    """
+    Distance and speed over a track. Legs longer than max_gap seconds
+    (default LOCATION_HISTORY_MAX_GAP) are the worker going offline, so they
+    are left out of the distance rather than counted as a straight line.
+    """
+    max_gap = settings.LOCATION_HISTORY_MAX_GAP if max_gap is None else max_gap
+    if len(track) < 2:
+        return {'points': len(track), 'distance_km': 0.0, 'moving_seconds': 0, 'average_speed_kmh': 0.0, 'max_speed_kmh': 0.0}
+
+    times = np.array([t.timestamp() for t, _, _ in track])
+    lats = np.array([lat for _, lat, _ in track])
+    lngs = np.array([lng for _, _, lng in track])
+
+    legs = haversine(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    gaps = np.diff(times)
+    live = (gaps > 0) & (gaps <= max_gap)
+
+    distance = float(legs[live].sum())
+    seconds = float(gaps[live].sum())
+    speeds = legs[live] / gaps[live] * 3600
+    return {
+        'points': len(track),
+        'distance_km': round(distance, 3),
+        'moving_seconds': int(seconds),
+        'average_speed_kmh': round(distance / seconds * 3600, 1) if seconds else 0.0,
+        'max_speed_kmh': round(float(speeds.max()), 1) if speeds.size else 0.0,
+    }
+
+
+def downsample(resolution, target, older_than, chunk=timedelta(hours=6)):
+    """
+    Replace points of `resolution` recorded before `older_than` with one
+    averaged point per worker per `target`-second bucket. Works through the
+    data in time chunks so memory stays bounded. Returns (removed, created).
+    """
+    removed = created = 0
+    # Align the cutoff and chunks to the bucket size so no bucket is split
+    older_than = _floor(older_than, target)
+    base = WorkerLocation.objects.filter(resolution=resolution, recorded_at__lt=older_than)
+    first = base.order_by('recorded_at').values_list('recorded_at', flat=True).first()
+    if first is None:
+        return removed, created
+
+    start = _floor(first, target)
+    while start < older_than:
+        end = min(start + chunk, older_than)
+        with transaction.atomic():
+            window = base.filter(recorded_at__gte=start, recorded_at__lt=end)
+            rows = list(window.values_list('worker_id', 'recorded_at', 'latitude', 'longitude'))
+            if rows:
+                buckets = {}
+                for wid, at, lat, lng in rows:
+                    key = (wid, int(at.timestamp()) // target)
+                    acc = buckets.setdefault(key, [0.0, 0.0, 0])
+                    acc[0] += lat
+                    acc[1] += lng
+                    acc[2] += 1
+                folded = [
+                    WorkerLocation(
+                        worker_id=wid,
+                        recorded_at=datetime.fromtimestamp(bucket * target, tz=dt_timezone.utc),
+                        latitude=lat_sum / n,
+                        longitude=lng_sum / n,
+                        resolution=target,
+                    )
+                    for (wid, bucket), (lat_sum, lng_sum, n) in buckets.items()
+                ]
+                removed += window.delete()[0]
+                WorkerLocation.objects.bulk_create(folded, batch_size=1000)
+                created += len(folded)
+        start = end
+    return removed, created
+
+
+def _floor(moment, seconds):
+    return datetime.fromtimestamp(int(moment.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def compact(now=None):
+    """Run every downsampling step and drop points past LOCATION_HISTORY_RETENTION_DAYS"""
+    now = now or timezone.now()
+    result = {}
+    for resolution, target, age_setting in DOWNSAMPLE_STEPS:
+        cutoff = now - timedelta(hours=getattr(settings, age_setting))
+        result[f'{resolution}s->{target}s'] = downsample(resolution, target, cutoff)
+    cutoff = now - timedelta(days=settings.LOCATION_HISTORY_RETENTION_DAYS)
+    result['expired'] = WorkerLocation.objects.filter(recorded_at__lt=cutoff).delete()[0]
+    return result
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.geo import haversine_km
+from reports.utils import batch_reports_by_proximity
+
+
+def brute_force_batches(reports, threshold_km=0.2):
+    """The original all-pairs grouping, kept as a reference for comparison"""
+    batches = []
+    visited = set()
+    for r1 in reports:
+        if r1['id'] in visited: continue
+        current_batch = [r1]
+        visited.add(r1['id'])
+        for r2 in reports:
+            if r2['id'] in visited: continue
+            if haversine_km(r1['lat'], r1['lng'], r2['lat'], r2['lng']) <= threshold_km:
+                current_batch.append(r2)
+                visited.add(r2['id'])
+        batches.append({'main_report': r1, 'others': current_batch[1:], 'count': len(current_batch)})
+    return batches
+
+
+def synthetic_reports(n, seed=0, center=(28.6139, 77.2090), spread_deg=0.15):
+    rng = random.Random(seed)
+    lat0, lng0 = center
+    return [
+        {
+            'id': i,
+            'lat': lat0 + rng.uniform(-spread_deg, spread_deg),
+            'lng': lng0 + rng.uniform(-spread_deg, spread_deg),
+        }
+        for i in range(n)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark batch_reports_by_proximity against the all-pairs reference on synthetic points"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000,100000',
+                            help='Comma-separated point counts')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Batch radius in km')
+        parser.add_argument('--brute-max', type=int, default=5000,
+                            help='Largest size to also run the all-pairs reference on')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        threshold = options['threshold']
+
+        self.stdout.write(f"{'points':>8} {'batches':>8} {'grid (s)':>10} {'all-pairs (s)':>14} {'speedup':>8}")
+        for n in sizes:
+            reports = synthetic_reports(n, seed=options['seed'])
+
+            start = time.perf_counter()
+            batches = batch_reports_by_proximity(reports, threshold)
+            grid_time = time.perf_counter() - start
+
+            brute_col, speedup_col = '-', '-'
+            if n <= options['brute_max']:
+                start = time.perf_counter()
+                reference = brute_force_batches(reports, threshold)
+                brute_time = time.perf_counter() - start
+                if reference != batches:
+                    self.stderr.write(self.style.ERROR(f"Grid batches differ from reference at n={n}"))
+                brute_col = f"{brute_time:.3f}"
+                speedup_col = f"{brute_time / grid_time:.1f}x"
+
+            self.stdout.write(f"{n:>8} {len(batches):>8} {grid_time:>10.3f} {brute_col:>14} {speedup_col:>8}")
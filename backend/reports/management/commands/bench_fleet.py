@@ -0,0 +1,50 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.fleet import plan_fleet
+from reports.management.commands.bench_routing import CENTER, clustered_city
+
+
+class Command(BaseCommand):
+    help = "Time the fleet planner on synthetic pending reports and online workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reports', default='1000,5000', help='Comma-separated pending report counts')
+        parser.add_argument('--workers', default='100,300', help='Comma-separated worker counts')
+        parser.add_argument('--max-jobs', type=int, default=None)
+        parser.add_argument('--budget', type=float, default=None, help='Total routing time budget in seconds')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        severities = ['low', 'medium', 'high']
+
+        self.stdout.write(f"{'reports':>8} {'workers':>8} {'assigned':>9} {'unassigned':>11} "
+                          f"{'min/max jobs':>13} {'seconds':>8}")
+        for n_workers in [int(s) for s in options['workers'].split(',') if s.strip()]:
+            for n_reports in [int(s) for s in options['reports'].split(',') if s.strip()]:
+                reports = clustered_city(n_reports, rng, clusters=40, spread_deg=0.15)
+                for r in reports:
+                    r['severity'] = rng.choice(severities)
+                workers = [
+                    {
+                        'id': n_reports + i,
+                        'lat': CENTER[0] + rng.uniform(-0.15, 0.15),
+                        'lng': CENTER[1] + rng.uniform(-0.15, 0.15),
+                        'jobs': [],
+                    }
+                    for i in range(n_workers)
+                ]
+
+                start = time.perf_counter()
+                plan = plan_fleet(reports, workers, max_jobs=options['max_jobs'], time_budget=options['budget'])
+                elapsed = time.perf_counter() - start
+
+                counts = [len(ids) for ids in plan['new'].values()]
+                assigned = sum(counts)
+                self.stdout.write(
+                    f"{n_reports:>8} {n_workers:>8} {assigned:>9} {len(plan['unassigned']):>11} "
+                    f"{f'{min(counts)}/{max(counts)}':>13} {elapsed:>8.2f}"
+                )
@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.geo import haversine_km
+from reports.tsp import solve_route
+from reports.utils import sort_by_distance
+
+CENTER = (28.6139, 77.2090)
+
+
+def uniform_city(n, rng, spread_deg=0.1):
+    lat0, lng0 = CENTER
+    return [
+        {'id': i, 'lat': lat0 + rng.uniform(-spread_deg, spread_deg), 'lng': lng0 + rng.uniform(-spread_deg, spread_deg)}
+        for i in range(n)
+    ]
+
+
+def clustered_city(n, rng, clusters=6, spread_deg=0.1, cluster_deg=0.008):
+    lat0, lng0 = CENTER
+    centres = [(lat0 + rng.uniform(-spread_deg, spread_deg), lng0 + rng.uniform(-spread_deg, spread_deg))
+               for _ in range(clusters)]
+    points = []
+    for i in range(n):
+        clat, clng = rng.choice(centres)
+        points.append({'id': i, 'lat': rng.gauss(clat, cluster_deg), 'lng': rng.gauss(clng, cluster_deg)})
+    return points
+
+
+CITIES = {'uniform': uniform_city, 'clustered': clustered_city}
+
+
+def route_length(start, route):
+    total, (lat, lng) = 0.0, start
+    for stop in route:
+        total += haversine_km(lat, lng, stop['lat'], stop['lng'])
+        lat, lng = stop['lat'], stop['lng']
+    return total
+
+
+class Command(BaseCommand):
+    help = "Compare the local route optimizer with the greedy nearest-neighbour fallback on synthetic cities"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,25,50,100,200', help='Comma-separated stop counts')
+        parser.add_argument('--runs', type=int, default=5, help='Random instances per size and city')
+        parser.add_argument('--budget', type=float, default=0.5, help='Optimizer time budget in seconds')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(
+            f"{'city':>10} {'stops':>6} {'greedy km':>10} {'local km':>9} {'saving':>7} "
+            f"{'greedy ms':>10} {'local ms':>9}"
+        )
+        for city, make_city in CITIES.items():
+            for n in sizes:
+                greedy_km, local_km, greedy_ms, local_ms = [], [], [], []
+                for _ in range(options['runs']):
+                    stops = make_city(n, rng)
+                    start = (CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05))
+
+                    t0 = time.perf_counter()
+                    greedy = sort_by_distance(*start, stops)
+                    t1 = time.perf_counter()
+                    local = solve_route(*start, stops, time_budget=options['budget'])
+                    t2 = time.perf_counter()
+
+                    greedy_km.append(route_length(start, greedy))
+                    local_km.append(route_length(start, local))
+                    greedy_ms.append((t1 - t0) * 1000)
+                    local_ms.append((t2 - t1) * 1000)
+
+                g, l = statistics.mean(greedy_km), statistics.mean(local_km)
+                self.stdout.write(
+                    f"{city:>10} {n:>6} {g:>10.2f} {l:>9.2f} {(1 - l / g) * 100:>6.1f}% "
+                    f"{statistics.mean(greedy_ms):>10.1f} {statistics.mean(local_ms):>9.1f}"
+                )
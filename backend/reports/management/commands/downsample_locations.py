@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from reports.location_history import compact
+
+
+class Command(BaseCommand):
+    help = "Fold old worker GPS history into 30 s / 5 min points and drop expired points (run periodically)"
+
+    def handle(self, *args, **options):
+        result = compact()
+        for step, value in result.items():
+            if step == 'expired':
+                self.stdout.write(f"expired: {value} points removed")
+            else:
+                removed, created = value
+                self.stdout.write(f"{step}: {removed} points folded into {created}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from reports.daily_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recount the daily report analytics rollup from the report table (after imports or bulk edits)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{rebuild()} daily rollup rows written")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from reports.worker_stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount worker performance stats and user rating totals from the report table, reporting any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report drift; don't rewrite the table")
+
+    def handle(self, *args, **options):
+        drift = reconcile(fix=not options['check'])
+        for worker_id, diff in sorted(drift.items()):
+            changes = ", ".join(f"{name} {old} -> {new}" for name, (old, new) in diff.items())
+            self.stdout.write(f"worker {worker_id}: {changes}")
+        if not drift:
+            self.stdout.write("No drift")
+        elif options['check']:
+            self.stdout.write(f"{len(drift)} worker(s) drifted; run without --check to fix")
+        else:
+            self.stdout.write(f"{len(drift)} worker(s) corrected")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from reports.osrm_stub import FakeOSRMServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local OSRM trip-API stand-in (point OSRM_BASE_URL at it)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=5005)
+        parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering')
+        parser.add_argument('--status', type=int, default=200, help='HTTP status to answer with')
+
+    def handle(self, *args, **options):
+        server = FakeOSRMServer(options['host'], options['port'], delay=options['delay'], status=options['status'])
+        self.stdout.write(f"Fake OSRM listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
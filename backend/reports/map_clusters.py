@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from .models import WasteReport
+from .spatial import tile_of, tiles_in_bbox
+
+SEVERITIES = ('low', 'medium', 'high')
+SEVERITY_LABELS = dict(WasteReport.SEVERITY_CHOICES)
+WASTE_TYPE_LABELS = dict(WasteReport.WASTE_TYPE_CHOICES)
+
+# Columns streamed per report; nothing else is loaded
+COLUMNS = ('id', 'latitude', 'longitude', 'severity', 'status', 'waste_type', 'created_at', 'image')
+
+
+def filter_bbox(reports, south, west, north, east):
+    """Reports inside a lat/lng box; west > east means the box crosses the antimeridian"""
+    q = Q(latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        q &= Q(longitude__gte=west, longitude__lte=east)
+    else:
+        q &= Q(longitude__gte=west) | Q(longitude__lte=east)
+    return reports.filter(q)
+
+
+def grid_zoom(bbox, zoom):
+    """
+    Tile zoom of the clustering grid: MAP_CLUSTER_CELL_BITS levels below the
+    map zoom (4x4 cells per 256 px tile by default), coarsened until the box
+    spans at most MAP_MAX_CLUSTERS cells, so the payload is bounded however
+    large the box is.
+    """
+    level = zoom + settings.MAP_CLUSTER_CELL_BITS
+    while level > 0 and tiles_in_bbox(*bbox, level, limit=settings.MAP_MAX_CLUSTERS) is None:
+        level -= 1
+    return level
+
+
+def _point(row):
+    report_id, lat, lng, severity, status, waste_type, created_at, image = row
+    return {
+        'id': report_id,
+        'lat': lat,
+        'lng': lng,
+        # Display labels, as the waste map page has always shown; the code drives the marker colour
+        'severity': SEVERITY_LABELS.get(severity, severity),
+        'severity_code': severity,
+        'status': status,
+        'waste_type': WASTE_TYPE_LABELS.get(waste_type, waste_type),
+        'created_at': created_at.strftime("%Y-%m-%d %H:%M"),
+        'image': default_storage.url(image) if image else "",
+        'detail_url': f"/reports/detail/{report_id}/",
+    }
+
+
+def cluster(reports, bbox, zoom):
+    """
+    Stream the reports in `bbox` and group them on a tile grid for `zoom`.
+
+    Returns {'clusters': [...], 'points': [...]}. A cluster is its centroid,
+    count and severity mix; a cell holding a single report is returned as a
+    point instead. At MAP_CLUSTER_MAX_ZOOM and above every report is a point,
+    unless there are more than MAP_MAX_POINTS of them, in which case the
+    clusters are returned. Memory is one accumulator per grid cell.
+    """
+    level = grid_zoom(bbox, zoom)
+    rows = (
+        filter_bbox(reports.filter(latitude__isnull=False, longitude__isnull=False), *bbox)
+        .order_by()
+        .values_list(*COLUMNS)
+        .iterator(chunk_size=2000)
+    )
+
+    want_points = zoom >= settings.MAP_CLUSTER_MAX_ZOOM
+    points = []
+    cells = {}
+    for row in rows:
+        lat, lng, severity = float(row[1]), float(row[2]), row[3]
+        row = (row[0], lat, lng) + row[3:]
+        if want_points:
+            points.append(row)
+            if len(points) > settings.MAP_MAX_POINTS:
+                want_points = False
+                points = []
+
+        key = tile_of(lat, lng, level)
+        cell = cells.get(key)
+        if cell is None:
+            # count, lat sum, lng sum, severity mix, first report
+            cell = cells[key] = [1, lat, lng, {s: 0 for s in SEVERITIES}, row]
+        else:
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lng
+        if severity in cell[3]:
+            cell[3][severity] += 1
+
+    if want_points:
+        return {'clusters': [], 'points': [_point(row) for row in points]}
+
+    clusters = []
+    singles = []
+    for count, lat_sum, lng_sum, severity, first in cells.values():
+        if count == 1:
+            singles.append(_point(first))
+        else:
+            clusters.append({
+                'lat': round(lat_sum / count, 6),
+                'lng': round(lng_sum / count, 6),
+                'count': count,
+                'severity': severity,
+            })
+    return {'clusters': clusters, 'points': singles}
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-17 12:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0015_alter_wastereport_description_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('resolution', models.PositiveSmallIntegerField(default=0)),
+                ('worker', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='location_history', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['worker', 'recorded_at'], name='reports_wor_worker__d05643_idx'), models.Index(fields=['resolution', 'recorded_at'], name='reports_wor_resolut_ae96fb_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-17 12:39
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    WasteReport = apps.get_model('reports', 'WasteReport')
+    ReportDailyStat = apps.get_model('reports', 'ReportDailyStat')
+    grouped = (
+        WasteReport.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'status', 'severity', 'waste_type')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    ReportDailyStat.objects.bulk_create([ReportDailyStat(**row) for row in grouped], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0016_workerlocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('assigned', 'Assigned'), ('resolved', 'Resolved')], max_length=20)),
+                ('severity', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('waste_type', models.CharField(choices=[('plastic', 'Plastic'), ('organic', 'Organic'), ('metal', 'Metal'), ('glass', 'Glass'), ('paper', 'Paper'), ('electronic', 'Electronic'), ('construction', 'Construction'), ('ewaste', 'E-Waste'), ('hazardous', 'Hazardous'), ('other', 'Other')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reportdailystat',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'severity', 'waste_type'), name='report_daily_stat_key'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.27 on 2026-10-17 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+
+def backfill(apps, schema_editor):
+    WasteReport = apps.get_model('reports', 'WasteReport')
+    WorkerStats = apps.get_model('reports', 'WorkerStats')
+    timed = Q(status='resolved', resolved_at__isnull=False)
+    rows = (
+        WasteReport.objects.filter(assigned_worker__isnull=False)
+        .values('assigned_worker_id')
+        .annotate(
+            assigned=Count('id'),
+            resolved=Count('id', filter=Q(status='resolved')),
+            pending=Count('id', filter=Q(status__in=['pending', 'assigned'])),
+            resolution_count=Count('id', filter=timed),
+            resolution_time=Sum(ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField()), filter=timed),
+            rating_count=Count('rating'),
+            rating_sum=Sum('rating'),
+        )
+        .order_by()
+    )
+    WorkerStats.objects.bulk_create([
+        WorkerStats(
+            worker_id=row['assigned_worker_id'],
+            assigned=row['assigned'],
+            resolved=row['resolved'],
+            pending=row['pending'],
+            resolution_count=row['resolution_count'],
+            resolution_seconds=row['resolution_time'].total_seconds() if row['resolution_time'] else 0.0,
+            rating_count=row['rating_count'],
+            rating_sum=row['rating_sum'] or 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_dark_mode'),
+        ('reports', '0017_reportdailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerStats',
+            fields=[
+                ('worker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='performance', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('assigned', models.IntegerField(default=0)),
+                ('resolved', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('resolution_count', models.IntegerField(default=0)),
+                ('resolution_seconds', models.FloatField(default=0.0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 
@@ -106,6 +106,22 @@ class WasteReport(models.Model):
     rating = models.PositiveSmallIntegerField(null=True, blank=True)
     review_text = models.TextField(null=True, blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signal handlers can tell what changed on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # One transaction with the ReportDailyStat update made by the signal handlers
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return (
             f"Report #{self.id} | "
@@ -128,3 +144,84 @@ class SupportTicket(models.Model):
 
     def __str__(self):
         return f"Ticket from {self.user.username}: {self.subject}"
+
+
+class WorkerLocation(models.Model):
+    """
+    Append-only worker GPS history. Raw fixes are stored with resolution 0;
+    the downsample_locations command later folds older points into 30 s and
+    then 5 min averages (resolution = seconds per point).
+    """
+    worker = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='location_history',
+        db_index=False
+    )
+    recorded_at = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    resolution = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['worker', 'recorded_at']),
+            models.Index(fields=['resolution', 'recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.worker_id} @ {self.recorded_at:%Y-%m-%d %H:%M:%S}"
+
+
+class ReportDailyStat(models.Model):
+    """
+    Report counts per creation day, status, severity and waste type, kept
+    current by the WasteReport signal handlers (see reports.daily_stats) so
+    analytics never scan the report table. Rebuild with rebuild_report_stats.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=WasteReport.STATUS_CHOICES)
+    severity = models.CharField(max_length=10, choices=WasteReport.SEVERITY_CHOICES)
+    waste_type = models.CharField(max_length=20, choices=WasteReport.WASTE_TYPE_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status', 'severity', 'waste_type'], name='report_daily_stat_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}/{self.severity}/{self.waste_type}: {self.count}"
+
+
+class WorkerStats(models.Model):
+    """
+    Running performance totals for one worker over the reports assigned to
+    them, kept current by the WasteReport signal handlers (see
+    reports.worker_stats). Check or rebuild with reconcile_worker_stats.
+    """
+    worker = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='performance'
+    )
+    assigned = models.IntegerField(default=0)
+    resolved = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    # Resolved reports with a resolved_at, and their total time from report to resolution
+    resolution_count = models.IntegerField(default=0)
+    resolution_seconds = models.FloatField(default=0.0)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+
+    @property
+    def avg_resolution_seconds(self):
+        return self.resolution_seconds / self.resolution_count if self.resolution_count else None
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def __str__(self):
+        return f"Stats for worker {self.worker_id}"
@@ -0,0 +1,128 @@
+"""
+A stand-in for an OSRM server's trip service.
+
+Answers /trip/v1/<profile>/<lng,lat;...> with the local solver's order in
+OSRM's response format, so OSRMBackend can be exercised without network
+access. The failure knobs (delay, status, code, drop) can be changed while
+the server is running to simulate an outage:
+
+    with FakeOSRMServer() as osrm:
+        backend = OSRMBackend(osrm.url, timeout=0.5)
+        osrm.status = 503
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .geo import haversine_km
+from .tsp import solve_route
+
+
+class FakeOSRMServer:
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, status=200, code='Ok', drop=False):
+        self.delay = delay
+        self.status = status
+        self.code = code
+        self.drop = drop
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def trip(self, coords):
+        """OSRM-style trip response for [(lng, lat), ...] with the first point as the source"""
+        start_lng, start_lat = coords[0]
+        stops = [{'index': i, 'lat': lat, 'lng': lng} for i, (lng, lat) in enumerate(coords[1:], start=1)]
+        route = solve_route(start_lat, start_lng, stops, time_budget=0.05)
+
+        visit_position = {0: 0}
+        for position, stop in enumerate(route, start=1):
+            visit_position[stop['index']] = position
+
+        distance, (lat, lng) = 0.0, (start_lat, start_lng)
+        for stop in route:
+            distance += haversine_km(lat, lng, stop['lat'], stop['lng']) * 1000
+            lat, lng = stop['lat'], stop['lng']
+
+        return {
+            'code': 'Ok',
+            'waypoints': [
+                {'waypoint_index': visit_position[i], 'trips_index': 0, 'location': [lng, lat]}
+                for i, (lng, lat) in enumerate(coords)
+            ],
+            'trips': [{'distance': distance, 'duration': distance / 8.0, 'legs': []}],
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                if server.delay:
+                    time.sleep(server.delay)
+                if server.drop:
+                    self.close_connection = True
+                    return
+
+                path = urllib.parse.urlsplit(self.path).path
+                parts = path.strip('/').split('/')
+                if len(parts) != 4 or parts[:2] != ['trip', 'v1']:
+                    return self._reply(400, {'code': 'InvalidUrl', 'message': path})
+                if server.status != 200:
+                    return self._reply(server.status, {'code': 'InternalError'})
+                if server.code != 'Ok':
+                    return self._reply(200, {'code': server.code, 'message': 'Simulated failure'})
+
+                try:
+                    coords = [tuple(float(v) for v in pair.split(',')) for pair in parts[3].split(';')]
+                except ValueError:
+                    return self._reply(400, {'code': 'InvalidQuery'})
+                self._reply(200, server.trip(coords))
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (e.g. its deadline passed) before we answered
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+
+SEEN_KEY = 'presence:workers'      # sorted set: worker id -> last heartbeat (unix time)
+POSITION_KEY = 'presence:position'  # hash: worker id -> "lat,lng"
+SOCKETS_KEY = 'presence:sockets'    # hash: worker id -> open location sockets
+
+# Drop one socket; the worker only leaves with their last one
+LEAVE_SCRIPT = """
+local n = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if n <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('HDEL', KEYS[3], ARGV[1])
+end
+return n
+"""
+
+
+class MemoryPresence:
+    """In-process registry, used with the in-memory channel layer (tests, single-process dev)"""
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._seen = {}
+        self._position = {}
+        self._sockets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return settings.PRESENCE_TTL if self._ttl is None else self._ttl
+
+    async def touch(self, worker_id, lat=None, lng=None):
+        with self._lock:
+            self._seen[worker_id] = time.time()
+            if lat is not None and lng is not None:
+                self._position[worker_id] = (float(lat), float(lng))
+
+    async def join(self, worker_id):
+        with self._lock:
+            self._sockets[worker_id] = self._sockets.get(worker_id, 0) + 1
+            self._seen[worker_id] = time.time()
+
+    async def leave(self, worker_id):
+        """Drop one of the worker's sockets; True if it was their last"""
+        with self._lock:
+            remaining = self._sockets.get(worker_id, 0) - 1
+            if remaining > 0:
+                self._sockets[worker_id] = remaining
+                return False
+            self._sockets.pop(worker_id, None)
+            self._seen.pop(worker_id, None)
+            self._position.pop(worker_id, None)
+            return True
+
+    def online(self):
+        """{worker_id: {'last_seen': unix time, 'lat': ..., 'lng': ...}} for live workers"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for wid in [wid for wid, seen in self._seen.items() if seen < cutoff]:
+                del self._seen[wid]
+                self._position.pop(wid, None)
+                self._sockets.pop(wid, None)
+            return {
+                wid: _entry(seen, self._position.get(wid))
+                for wid, seen in self._seen.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+            self._position.clear()
+            self._sockets.clear()
+
+
+class RedisPresence:
+    """
+    Registry in the channel layer's Redis: a sorted set of worker ids scored
+    by last heartbeat plus a hash of their latest positions. Listing purges
+    expired members first, so it only ever touches online workers. Open
+    sockets are counted per worker across processes, so closing one of
+    several doesn't take the worker offline.
+    """
+
+    def __init__(self, url, ttl=None):
+        import redis
+
+        self.url = url
+        self._ttl = ttl
+        self._client = redis.Redis.from_url(url)
+        self._async_client = None
+        self._async_loop = None
+
+    @property
+    def ttl(self):
+        return settings.PRESENCE_TTL if self._ttl is None else self._ttl
+
+    def _aclient(self):
+        # redis.asyncio connections belong to the loop that created them
+        import redis.asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = redis.asyncio.Redis.from_url(self.url)
+            self._async_loop = loop
+        return self._async_client
+
+    async def touch(self, worker_id, lat=None, lng=None):
+        pipe = self._aclient().pipeline(transaction=False)
+        pipe.zadd(SEEN_KEY, {worker_id: time.time()})
+        if lat is not None and lng is not None:
+            pipe.hset(POSITION_KEY, worker_id, f"{float(lat)},{float(lng)}")
+        await pipe.execute()
+
+    async def join(self, worker_id):
+        pipe = self._aclient().pipeline(transaction=False)
+        pipe.hincrby(SOCKETS_KEY, worker_id, 1)
+        pipe.zadd(SEEN_KEY, {worker_id: time.time()})
+        await pipe.execute()
+
+    async def leave(self, worker_id):
+        return await self._aclient().eval(LEAVE_SCRIPT, 3, SOCKETS_KEY, SEEN_KEY, POSITION_KEY, worker_id) <= 0
+
+    def online(self):
+        cutoff = time.time() - self.ttl
+        expired = self._client.zrangebyscore(SEEN_KEY, '-inf', f'({cutoff}')
+        if expired:
+            pipe = self._client.pipeline(transaction=False)
+            pipe.zrem(SEEN_KEY, *expired)
+            pipe.hdel(POSITION_KEY, *expired)
+            # Counts left behind by a process that died with sockets open
+            pipe.hdel(SOCKETS_KEY, *expired)
+            pipe.execute()
+
+        members = self._client.zrange(SEEN_KEY, 0, -1, withscores=True)
+        if not members:
+            return {}
+        positions = self._client.hmget(POSITION_KEY, [wid for wid, _ in members])
+        result = {}
+        for (wid, seen), position in zip(members, positions):
+            if position is not None:
+                lat, lng = position.decode().split(',')
+                position = (float(lat), float(lng))
+            result[int(wid)] = _entry(seen, position)
+        return result
+
+    def clear(self):
+        self._client.delete(SEEN_KEY, POSITION_KEY, SOCKETS_KEY)
+
+
+def _entry(seen, position):
+    lat, lng = position if position is not None else (None, None)
+    return {'last_seen': seen, 'lat': lat, 'lng': lng}
+
+
+_registry = None
+_registry_config = None
+
+
+def get_presence():
+    """
+    The registry matching the configured channel layer: Redis alongside
+    RedisChannelLayer, otherwise the in-process stand-in.
+    """
+    global _registry, _registry_config
+    layer = settings.CHANNEL_LAYERS.get('default', {})
+    config = (layer.get('BACKEND'), str(layer.get('CONFIG', {}).get('hosts')))
+    if _registry is None or _registry_config != config:
+        if layer.get('BACKEND') == 'channels_redis.core.RedisChannelLayer':
+            host = layer['CONFIG']['hosts'][0]
+            if isinstance(host, dict):
+                host = host['address']
+            if isinstance(host, (tuple, list)):
+                host = f"redis://{host[0]}:{host[1]}"
+            _registry = RedisPresence(host)
+        else:
+            _registry = MemoryPresence()
+        _registry_config = config
+    return _registry
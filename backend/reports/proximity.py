@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+class ArrivalTracker:
+    """
+    Inside/outside state for one worker against each of their assigned reports.
+
+    A report is entered when the worker comes within ARRIVAL_ENTER_KM and only
+    left again beyond ARRIVAL_EXIT_KM, so GPS jitter around the boundary
+    doesn't produce repeated arrivals. Transitions are written to the cache,
+    so a reconnecting socket picks up where the last one left off. Each
+    arrival is claimed with cache.add, so when a worker has several sockets
+    open only one of them announces it.
+    """
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.inside = set()
+
+    def _key(self, report_id):
+        return f"arrived:{self.worker_id}:{report_id}"
+
+    async def load(self, report_ids):
+        """Restore state for the worker's current reports, dropping any others"""
+        keys = {self._key(rid): rid for rid in report_ids}
+        stored = await cache.aget_many(list(keys)) if keys else {}
+        self.inside = {keys[key] for key in stored}
+
+    async def update(self, report_ids, distances):
+        """Feed the latest distances (km); returns the report ids just arrived at"""
+        arrived, left = [], []
+        for rid, dist in zip(report_ids, distances):
+            if rid in self.inside:
+                if dist > settings.ARRIVAL_EXIT_KM:
+                    self.inside.discard(rid)
+                    left.append(rid)
+            elif dist < settings.ARRIVAL_ENTER_KM:
+                self.inside.add(rid)
+                if await cache.aadd(self._key(rid), True, settings.ARRIVAL_STATE_TTL):
+                    arrived.append(rid)
+
+        if left:
+            await cache.adelete_many([self._key(rid) for rid in left])
+        return arrived
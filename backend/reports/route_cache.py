@@ -0,0 +1,63 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+# Entries live in the process-local 'routes' cache (LRU + TTL). The
+# per-worker generation token lives in the default cache, so bumping it
+# invalidates the worker's entries everywhere that cache is shared.
+
+
+def _routes():
+    return caches['routes']
+
+
+def _generation(worker_id):
+    key = f"route_gen:{worker_id}"
+    gen = cache.get(key)
+    if gen is None:
+        gen = uuid.uuid4().hex[:12]
+        cache.add(key, gen, None)
+        gen = cache.get(key, gen)
+    return gen
+
+
+def snap(lat, lng):
+    places = settings.ROUTE_CACHE_SNAP_DECIMALS
+    return round(float(lat), places), round(float(lng), places)
+
+
+def get_assigned(worker_id, loader):
+    """The worker's assigned-report payload, built with loader() on a miss"""
+    # Read the generation before loading, so an invalidation that lands while
+    # loader() runs leaves the result under a key that is already dead.
+    key = f"assigned:{worker_id}:{_generation(worker_id)}"
+    payload = _routes().get(key)
+    if payload is None:
+        payload = loader()
+        _routes().set(key, payload)
+    return payload
+
+
+def get_route(worker_id, report_ids, lat, lng, builder, engine=None):
+    """
+    Route for this worker's report set from (lat, lng), built with builder()
+    on a miss. Positions are snapped (ROUTE_CACHE_SNAP_DECIMALS) so small
+    GPS movements hit the same entry.
+    """
+    ids = ",".join(str(i) for i in sorted(report_ids))
+    digest = hashlib.blake2b(ids.encode(), digest_size=12).hexdigest()
+    lat, lng = snap(lat, lng)
+    key = f"route:{worker_id}:{_generation(worker_id)}:{engine or 'default'}:{digest}:{lat}:{lng}"
+    route = _routes().get(key)
+    if route is None:
+        route = builder()
+        _routes().set(key, route)
+    return route
+
+
+def invalidate_worker(worker_id):
+    """Drop every cached route and assignment list for this worker"""
+    if worker_id:
+        cache.set(f"route_gen:{worker_id}", uuid.uuid4().hex[:12], None)
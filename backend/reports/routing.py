@@ -3,5 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/location/(?P<role>\w+)/$', consumers.LocationConsumer.as_asgi()),
+    re_path(r'ws/fleet/$', consumers.FleetMapConsumer.as_asgi()),
     re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
 ]
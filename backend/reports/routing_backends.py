@@ -0,0 +1,255 @@
+"""
+Routing backends for get_optimized_route.
+
+A backend takes the worker's start position and a list of
+{'id', 'lat', 'lng', ...} dicts and returns the same dicts in visiting order.
+FallbackRouter puts a circuit breaker in front of a remote backend, so that
+while the router is down every call goes straight to the local solver
+instead of waiting out a timeout.
+"""
+import http.client
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.parse
+
+from django.conf import settings
+
+from .tsp import solve_route
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingError(Exception):
+    pass
+
+
+class RoutingBackend:
+    name = None
+
+    def optimize(self, start_lat, start_lng, locations, timeout=None):
+        raise NotImplementedError
+
+
+class LocalBackend(RoutingBackend):
+    """Nearest-neighbour + 2-opt/Or-opt in process; never touches the network"""
+    name = 'local'
+
+    def __init__(self, time_budget=None):
+        self.time_budget = time_budget
+
+    def optimize(self, start_lat, start_lng, locations, timeout=None):
+        budget = self.time_budget if self.time_budget is not None else settings.ROUTE_OPTIMIZER_TIME_BUDGET
+        if timeout is not None:
+            budget = max(min(budget, timeout), 0.0)
+        return solve_route(start_lat, start_lng, locations, time_budget=budget)
+
+
+class HTTPConnectionPool:
+    """Small keep-alive connection pool for a single host"""
+
+    def __init__(self, base_url, maxsize=4, user_agent='Scan2Clean/1.0'):
+        parts = urllib.parse.urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.headers = {'User-Agent': user_agent, 'Connection': 'keep-alive'}
+        self._idle = queue.LifoQueue(maxsize)
+
+    def _checkout(self, timeout):
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self.connection_class(self.host, self.port, timeout=timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, reused
+
+    def _checkin(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def get_json(self, path, timeout):
+        deadline = time.monotonic() + timeout
+        conn, reused = self._checkout(timeout)
+        try:
+            conn.request('GET', self.base_path + path, headers=self.headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            remaining = deadline - time.monotonic()
+            # A pooled connection the server already closed; retry once on a fresh one
+            if not reused or remaining <= 0:
+                raise
+            conn = self.connection_class(self.host, self.port, timeout=remaining)
+            try:
+                conn.request('GET', self.base_path + path, headers=self.headers)
+                response = conn.getresponse()
+                body = response.read()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+
+        if response.status != 200:
+            raise RoutingError(f"HTTP {response.status}")
+        return json.loads(body.decode())
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class OSRMBackend(RoutingBackend):
+    """Client for the OSRM trip service (or anything that speaks its API)"""
+    name = 'osrm'
+
+    def __init__(self, base_url, timeout=2.0, pool_size=4, profile='driving'):
+        self.timeout = timeout
+        self.profile = profile
+        self.pool = HTTPConnectionPool(base_url, maxsize=pool_size)
+
+    def optimize(self, start_lat, start_lng, locations, timeout=None):
+        if not locations:
+            return []
+        # OSRM expects Longitude, Latitude
+        coords = [f"{start_lng},{start_lat}"]
+        coords += [f"{loc['lng']},{loc['lat']}" for loc in locations]
+        path = f"/trip/v1/{self.profile}/{';'.join(coords)}?source=first&roundtrip=false&overview=false"
+
+        timeout = self.timeout if timeout is None else min(self.timeout, timeout)
+        if timeout <= 0:
+            raise RoutingError("Deadline already passed")
+        data = self.pool.get_json(path, timeout)
+        if data.get('code') != 'Ok':
+            raise RoutingError(f"OSRM returned {data.get('code')}: {data.get('message', '')}")
+
+        # 'waypoints' follows the input order; waypoint_index is each input's position in the trip
+        waypoints = data.get('waypoints', [])
+        if len(waypoints) != len(locations) + 1:
+            raise RoutingError("OSRM returned an unexpected number of waypoints")
+        visit_order = sorted(range(len(waypoints)), key=lambda i: waypoints[i]['waypoint_index'])
+        # Input 0 is the worker's start position
+        return [locations[i - 1] for i in visit_order if i != 0]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, allow()
+    returns False until `reset_timeout` seconds have passed, after which a
+    single probe call is let through; its outcome closes or re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._probing = False
+
+
+class FallbackRouter(RoutingBackend):
+    """Try `primary` behind a circuit breaker; use `fallback` on failure or while open"""
+
+    def __init__(self, primary, fallback, breaker=None, deadline=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.name = primary.name
+
+    def optimize(self, start_lat, start_lng, locations, timeout=None):
+        timeout = timeout if timeout is not None else self.deadline
+        started = time.monotonic()
+
+        if self.breaker.allow():
+            try:
+                route = self.primary.optimize(start_lat, start_lng, locations, timeout=timeout)
+            except Exception as e:
+                self.breaker.record_failure()
+                logger.warning("%s routing failed (%s), using %s", self.primary.name, e, self.fallback.name)
+            else:
+                self.breaker.record_success()
+                return route
+
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - started), 0.0)
+        return self.fallback.optimize(start_lat, start_lng, locations, timeout=remaining)
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(engine=None):
+    """Process-wide router for `engine` ('osrm' or 'local'), built from settings on first use"""
+    engine = engine or settings.ROUTING_ENGINE
+    with _routers_lock:
+        if engine not in _routers:
+            local = LocalBackend()
+            if engine == 'local':
+                _routers[engine] = local
+            elif engine == 'osrm':
+                osrm = OSRMBackend(
+                    settings.OSRM_BASE_URL,
+                    timeout=settings.OSRM_TIMEOUT,
+                    pool_size=settings.OSRM_POOL_SIZE,
+                )
+                breaker = CircuitBreaker(
+                    failure_threshold=settings.OSRM_BREAKER_THRESHOLD,
+                    reset_timeout=settings.OSRM_BREAKER_RESET,
+                )
+                _routers[engine] = FallbackRouter(osrm, local, breaker, deadline=settings.ROUTING_DEADLINE)
+            else:
+                raise ValueError(f"Unknown routing engine {engine!r}")
+        return _routers[engine]
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Process-wide totals across all connections: sent, coalesced, dropped.
+# Reported by the notifications outbox_stats endpoint.
+totals = Counter()
+
+
+class SendQueue:
+    """
+    Bounded outbound queue for one WebSocket connection.
+
+    Event handlers put a zero-argument coroutine function instead of
+    awaiting self.send, so a slow client never holds up the consumer's
+    channel-layer reads. Items sharing a key (e.g. one worker's location)
+    replace each other in place, so only the latest is sent. Past `maxsize`
+    the oldest droppable item is discarded; items queued with
+    droppable=False (notifications) are always kept.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or settings.WS_SEND_QUEUE_SIZE
+        self.items = OrderedDict()
+        self._seq = 0
+        self._task = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def put(self, send, key=None, droppable=False):
+        if key is not None and key in self.items:
+            self.items[key] = (send, droppable)
+            self._count('coalesced')
+        else:
+            if key is None:
+                key = ('seq', self._seq)
+                self._seq += 1
+            self.items[key] = (send, droppable)
+            if len(self.items) > self.maxsize:
+                self._drop_oldest()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    def _drop_oldest(self):
+        for key, (_, droppable) in self.items.items():
+            if droppable:
+                del self.items[key]
+                self._count('dropped')
+                return
+
+    def _count(self, name, n=1):
+        setattr(self, name, getattr(self, name) + n)
+        totals[name] += n
+
+    async def _drain(self):
+        while self.items:
+            _, (send, _) = self.items.popitem(last=False)
+            try:
+                await send()
+            except Exception:
+                logger.exception("WebSocket send failed")
+                continue
+            self._count('sent')
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self.coalesced or self.dropped:
+            logger.info(
+                "WebSocket send queue closed: %d sent, %d coalesced, %d dropped",
+                self.sent, self.coalesced, self.dropped,
+            )
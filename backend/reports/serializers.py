@@ -8,6 +8,7 @@ class WasteReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = WasteReport
         fields = '__all__'
+        read_only_fields = ('citizen',)
 
 class SupportTicketSerializer(serializers.ModelSerializer):
     user_name = serializers.ReadOnlyField(source='user.username')
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import daily_stats, dashboard_stats, route_cache, worker_stats
+from .models import WasteReport
+from .utils import notify_assignments_changed
+
+# Fields that decide whether, and where, a report is on a worker's job list
+ASSIGNMENT_FIELDS = ('assigned_worker_id', 'status', 'latitude', 'longitude')
+
+# Columns the report rollups (daily_stats, worker_stats) are derived from
+STORED_FIELDS = ('created_at', 'status', 'severity', 'waste_type', 'assigned_worker_id', 'resolved_at', 'rating')
+
+
+def affected_workers(report):
+    """Worker ids whose assignment list this report was or is now part of"""
+    previous = getattr(report, '_loaded_values', {}).get('assigned_worker_id')
+    return {w for w in (previous, report.assigned_worker_id) if w}
+
+
+def assignment_changed(report, created):
+    loaded = getattr(report, '_loaded_values', None)
+    if created or loaded is None:
+        return True
+    return any(f in loaded and loaded[f] != getattr(report, f) for f in ASSIGNMENT_FIELDS)
+
+
+def stored_row(report, update_fields=None):
+    """
+    The report's STORED_FIELDS as currently in the database, row-locked until
+    the transaction ends; None if it isn't saved yet. The in-memory instance
+    may be stale, so the rollups take their "before" values from here.
+    """
+    if report._state.adding or report.pk is None:
+        return None
+    if update_fields is not None and not set(update_fields) & {*STORED_FIELDS, 'assigned_worker'}:
+        # None of the tracked columns are written
+        return {f: getattr(report, f) for f in STORED_FIELDS}
+    return WasteReport.objects.select_for_update().filter(pk=report.pk).values(*STORED_FIELDS).first()
+
+
+def invalidate_dashboard_stats(report, workers):
+    citizens = {getattr(report, '_loaded_values', {}).get('citizen_id'), report.citizen_id}
+    transaction.on_commit(lambda: dashboard_stats.invalidate(citizens, workers))
+
+
+def push_assignment_change(worker_ids):
+    for worker_id in worker_ids:
+        transaction.on_commit(lambda worker_id=worker_id: notify_assignments_changed(worker_id))
+
+
+@receiver(pre_save, sender=WasteReport)
+def report_saving(sender, instance, update_fields=None, **kwargs):
+    instance._stored = stored_row(instance, update_fields)
+
+
+@receiver(post_save, sender=WasteReport)
+def report_saved(sender, instance, created, **kwargs):
+    workers = affected_workers(instance)
+    for worker_id in workers:
+        route_cache.invalidate_worker(worker_id)
+    if assignment_changed(instance, created):
+        push_assignment_change(workers)
+    stored = getattr(instance, '_stored', None)
+    daily_stats.report_saved(instance, stored)
+    worker_stats.report_saved(instance, stored)
+    invalidate_dashboard_stats(instance, workers)
+    instance._loaded_values = {
+        f.attname: getattr(instance, f.attname) for f in instance._meta.concrete_fields
+    }
+
+
+@receiver(pre_delete, sender=WasteReport)
+def report_deleting(sender, instance, **kwargs):
+    instance._stored = stored_row(instance)
+
+
+@receiver(post_delete, sender=WasteReport)
+def report_deleted(sender, instance, **kwargs):
+    stored = getattr(instance, '_stored', None)
+    daily_stats.report_deleted(stored)
+    worker_stats.report_deleted(stored)
+    workers = affected_workers(instance)
+    invalidate_dashboard_stats(instance, workers)
+    for worker_id in workers:
+        route_cache.invalidate_worker(worker_id)
+    push_assignment_change(workers)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        # The site stats include the number of accounts
+        transaction.on_commit(dashboard_stats.invalidate)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    transaction.on_commit(dashboard_stats.invalidate)
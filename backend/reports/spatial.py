@@ -0,0 +1,85 @@
+import math
+from collections import defaultdict
+
+KM_PER_DEG_LAT = 111.195
+
+
+class GridIndex:
+    """
+    Fixed-cell lat/lng grid for neighbourhood lookups.
+
+    Cells are `cell_km` tall, and wide enough in longitude that a cell is at
+    least `cell_km` across at `ref_lat` (pass the latitude furthest from the
+    equator in the data set). Any two points within `cell_km` of each other
+    are therefore in the same or adjacent cells.
+    """
+
+    def __init__(self, cell_km, ref_lat=0.0):
+        self.cell_lat = cell_km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(abs(ref_lat), 89.0))), 0.01)
+        self.cell_lng = self.cell_lat / cos_lat
+        self.cells = defaultdict(dict)
+
+    def cell_of(self, lat, lng):
+        return (math.floor(lat / self.cell_lat), math.floor(lng / self.cell_lng))
+
+    def insert(self, key, lat, lng, value=None):
+        self.cells[self.cell_of(lat, lng)][key] = value
+
+    def remove(self, key, lat, lng):
+        cell = self.cell_of(lat, lng)
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def nearby(self, lat, lng):
+        """Yield (key, value) for every entry in the 3x3 block of cells around a point"""
+        row, col = self.cell_of(lat, lng)
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                bucket = self.cells.get((row + dr, col + dc))
+                if bucket:
+                    yield from bucket.items()
+
+    def ring(self, lat, lng, radius):
+        """
+        Yield (key, value) for entries in cells exactly `radius` cells away
+        (Chebyshev distance) from the point's cell; radius 0 is its own cell.
+        Walking radius 0, 1, 2, ... visits the grid outwards from the point.
+        """
+        row, col = self.cell_of(lat, lng)
+        for dr in range(-radius, radius + 1):
+            edge = abs(dr) == radius
+            for dc in range(-radius, radius + 1) if edge else (-radius, radius):
+                bucket = self.cells.get((row + dr, col + dc))
+                if bucket:
+                    yield from bucket.items()
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.cells.values())
+
+
+def tile_of(lat, lng, zoom):
+    """Web Mercator (slippy map) tile (x, y) containing a point"""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return (min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def tiles_in_bbox(south, west, north, east, zoom, limit=None):
+    """
+    Tiles covering a lat/lng box; west > east means the box crosses the
+    antimeridian. Returns None if there would be more than `limit`.
+    """
+    n = 2 ** zoom
+    x1, y1 = tile_of(north, west, zoom)
+    x2, y2 = tile_of(south, east, zoom)
+    xs = range(x1, x2 + 1) if x1 <= x2 else list(range(x1, n)) + list(range(0, x2 + 1))
+    ys = range(y1, y2 + 1)
+    if limit is not None and len(xs) * len(ys) > limit:
+        return None
+    return [(x, y) for x in xs for y in ys]
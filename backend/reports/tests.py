@@ -1,3 +1,472 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from . import daily_stats, dispatch, worker_stats
+from .geo import haversine_km
+from .consumers import LocationConsumer
+from .models import ReportDailyStat, WasteReport, WorkerStats
+from .osrm_stub import FakeOSRMServer
+from .presence import get_presence
+from .routing_backends import CircuitBreaker, FallbackRouter, OSRMBackend, RoutingBackend, RoutingError
+from .utils import batch_reports_by_proximity
+
+STOPS = [
+    {'id': 1, 'lat': 28.6139, 'lng': 77.2090},
+    {'id': 2, 'lat': 28.6200, 'lng': 77.2150},
+    {'id': 3, 'lat': 28.6300, 'lng': 77.2000},
+    {'id': 4, 'lat': 28.6050, 'lng': 77.2300},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingBackend(RoutingBackend):
+    """Returns the input order and remembers the timeout of each call"""
+    name = 'recording'
+
+    def __init__(self):
+        self.timeouts = []
+
+    def optimize(self, start_lat, start_lng, locations, timeout=None):
+        self.timeouts.append(timeout)
+        return list(locations)
+
+
+class ReversedTripServer(FakeOSRMServer):
+    """Always visits the stops in reverse input order"""
+
+    def trip(self, coords):
+        n = len(coords) - 1
+        # waypoint_index is each input's position in the trip; input 0 (the start) stays first
+        positions = [0] + [n - i + 1 for i in range(1, n + 1)]
+        return {
+            'code': 'Ok',
+            'waypoints': [{'waypoint_index': p, 'trips_index': 0, 'location': list(c)} for p, c in zip(positions, coords)],
+            'trips': [{'distance': 0.0, 'duration': 0.0, 'legs': []}],
+        }
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=self.clock)
+
+    def test_opens_after_threshold_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 29.9
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now = 30
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now = 59
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow())
+
+    def test_successful_probe_closes(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+
+class OSRMBackendTests(SimpleTestCase):
+    def test_orders_stops_by_waypoint_index(self):
+        with ReversedTripServer() as osrm:
+            route = OSRMBackend(osrm.url, timeout=2).optimize(28.61, 77.20, STOPS)
+        self.assertEqual([r['id'] for r in route], [4, 3, 2, 1])
+
+    def test_solver_backed_trip_visits_every_stop(self):
+        with FakeOSRMServer() as osrm:
+            route = OSRMBackend(osrm.url, timeout=2).optimize(28.61, 77.20, STOPS)
+        self.assertCountEqual([r['id'] for r in route], [1, 2, 3, 4])
+
+    def test_no_stops_skips_the_request(self):
+        with FakeOSRMServer() as osrm:
+            self.assertEqual(OSRMBackend(osrm.url).optimize(28.61, 77.20, []), [])
+            self.assertEqual(osrm.requests, 0)
+
+    def test_http_error(self):
+        with FakeOSRMServer(status=503) as osrm:
+            with self.assertRaisesMessage(RoutingError, 'HTTP 503'):
+                OSRMBackend(osrm.url, timeout=2).optimize(28.61, 77.20, STOPS)
+
+    def test_error_code(self):
+        with FakeOSRMServer(code='NoTrips') as osrm:
+            with self.assertRaisesMessage(RoutingError, 'NoTrips'):
+                OSRMBackend(osrm.url, timeout=2).optimize(28.61, 77.20, STOPS)
+
+    def test_dropped_connection(self):
+        with FakeOSRMServer(drop=True) as osrm:
+            with self.assertRaises(Exception):
+                OSRMBackend(osrm.url, timeout=2).optimize(28.61, 77.20, STOPS)
+
+    def test_slow_server_times_out(self):
+        with FakeOSRMServer(delay=1.0) as osrm:
+            with self.assertRaises(Exception):
+                OSRMBackend(osrm.url, timeout=0.2).optimize(28.61, 77.20, STOPS)
+
+    def test_pooled_connection_is_reused(self):
+        with FakeOSRMServer() as osrm:
+            backend = OSRMBackend(osrm.url, timeout=2)
+            backend.optimize(28.61, 77.20, STOPS)
+            backend.optimize(28.61, 77.20, STOPS)
+            self.assertEqual(backend.pool._idle.qsize(), 1)
+            backend.pool.close()
+
+
+class FallbackRouterTests(SimpleTestCase):
+    def test_uses_primary_when_healthy(self):
+        fallback = RecordingBackend()
+        with ReversedTripServer() as osrm:
+            router = FallbackRouter(OSRMBackend(osrm.url, timeout=2), fallback, deadline=3)
+            route = router.optimize(28.61, 77.20, STOPS)
+        self.assertEqual([r['id'] for r in route], [4, 3, 2, 1])
+        self.assertEqual(fallback.timeouts, [])
+
+    def test_fallback_gets_what_is_left_of_the_deadline(self):
+        fallback = RecordingBackend()
+        with FakeOSRMServer(delay=1.0) as osrm:
+            router = FallbackRouter(OSRMBackend(osrm.url, timeout=5), fallback, deadline=0.3)
+            route = router.optimize(28.61, 77.20, STOPS)
+        self.assertEqual(route, STOPS)
+        self.assertEqual(len(fallback.timeouts), 1)
+        self.assertLess(fallback.timeouts[0], 0.1)
+        self.assertEqual(router.breaker.failures, 1)
+
+    def test_fallback_gets_the_rest_after_a_fast_failure(self):
+        fallback = RecordingBackend()
+        with FakeOSRMServer(status=500) as osrm:
+            router = FallbackRouter(OSRMBackend(osrm.url, timeout=5), fallback, deadline=3)
+            router.optimize(28.61, 77.20, STOPS)
+        self.assertGreater(fallback.timeouts[0], 2.5)
+        self.assertLessEqual(fallback.timeouts[0], 3)
+
+    def test_open_breaker_skips_primary(self):
+        clock = FakeClock()
+        fallback = RecordingBackend()
+        with FakeOSRMServer(status=503) as osrm:
+            router = FallbackRouter(
+                OSRMBackend(osrm.url, timeout=2), fallback,
+                CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock), deadline=3,
+            )
+            for _ in range(4):
+                router.optimize(28.61, 77.20, STOPS)
+            self.assertEqual(osrm.requests, 2)
+            self.assertAlmostEqual(fallback.timeouts[-1], 3, places=2)
+
+            # After the reset timeout one probe reaches the recovered server and closes the breaker
+            osrm.status = 200
+            clock.now = 30
+            router.optimize(28.61, 77.20, STOPS)
+            self.assertEqual(osrm.requests, 3)
+            self.assertEqual(router.breaker.state, CircuitBreaker.CLOSED)
+            self.assertEqual(len(fallback.timeouts), 4)
+
+
+def rollup():
+    """The daily rollup as {(day, status, severity, waste_type): count}, without empty rows"""
+    return {
+        (row.day, row.status, row.severity, row.waste_type): row.count
+        for row in ReportDailyStat.objects.filter(count__gt=0)
+    }
+
+
+class ReportDailyStatTests(TestCase):
+    def setUp(self):
+        self.citizen = User.objects.create_user('citizen', password='x')
+
+    def report(self, **fields):
+        return WasteReport.objects.create(citizen=self.citizen, **{'waste_type': 'plastic', 'severity': 'low', **fields})
+
+    def assertMatchesRebuild(self):
+        before = rollup()
+        daily_stats.rebuild()
+        self.assertEqual(before, rollup())
+
+    def test_create_counts_each_report(self):
+        self.report()
+        self.report()
+        self.report(severity='high')
+        today = timezone.localdate()
+        self.assertEqual(rollup(), {
+            (today, 'pending', 'low', 'plastic'): 2,
+            (today, 'pending', 'high', 'plastic'): 1,
+        })
+        self.assertMatchesRebuild()
+
+    def test_update_moves_the_count(self):
+        report = self.report()
+        report.status = 'assigned'
+        report.save()
+        self.assertEqual(daily_stats.counts_by('status'), [{'status': 'assigned', 'count': 1}])
+        self.assertMatchesRebuild()
+
+    def test_update_without_changes_keeps_the_count(self):
+        report = self.report()
+        report.description = 'Still here'
+        report.save()
+        self.assertEqual(sum(rollup().values()), 1)
+
+    def test_stale_instance_moves_from_the_stored_row(self):
+        report = self.report()
+        stale = WasteReport.objects.get(pk=report.pk)
+        report.status = 'assigned'
+        report.save()
+        # `stale` still thinks the report is pending; its save must move the count from 'assigned'
+        stale.status = 'assigned'
+        stale.severity = 'high'
+        stale.save()
+        self.assertEqual(list(rollup().values()), [1])
+        self.assertMatchesRebuild()
+
+    def test_delete_removes_the_count(self):
+        report = self.report()
+        self.report()
+        report.delete()
+        self.assertEqual(sum(rollup().values()), 1)
+        self.assertMatchesRebuild()
+
+    def test_daily_buckets_by_creation_day(self):
+        old = self.report()
+        WasteReport.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=3))
+        old.refresh_from_db()
+        # update() bypasses the signals, so recount
+        daily_stats.rebuild()
+        self.report()
+        days = [row['day'] for row in daily_stats.daily(timezone.localdate() - timedelta(days=6))]
+        self.assertEqual(days, [timezone.localdate(old.created_at), timezone.localdate()])
+
+
+class WorkerStatsTests(TestCase):
+    def setUp(self):
+        self.citizen = User.objects.create_user('citizen', password='x')
+        self.worker = User.objects.create_user('worker', password='x', role='worker')
+        self.other = User.objects.create_user('other', password='x', role='worker')
+
+    def stats(self, worker):
+        row = WorkerStats.objects.filter(worker=worker).values('assigned', 'resolved', 'pending', 'resolution_count').first()
+        return row or dict.fromkeys(('assigned', 'resolved', 'pending', 'resolution_count'), 0)
+
+    def assertNoDrift(self):
+        self.assertEqual(worker_stats.reconcile(fix=False), {})
+
+    def test_assignment_counts_for_the_worker(self):
+        WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='assigned')
+        WasteReport.objects.create(citizen=self.citizen)
+        self.assertEqual(self.stats(self.worker), {'assigned': 1, 'resolved': 0, 'pending': 1, 'resolution_count': 0})
+        self.assertNoDrift()
+
+    def test_resolving_adds_the_resolution_time(self):
+        report = WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='assigned')
+        report.status = 'resolved'
+        report.resolved_at = report.created_at + timedelta(hours=2)
+        report.save()
+        self.assertEqual(self.stats(self.worker), {'assigned': 1, 'resolved': 1, 'pending': 0, 'resolution_count': 1})
+        self.assertAlmostEqual(WorkerStats.objects.get(worker=self.worker).resolution_seconds, 7200)
+        self.assertNoDrift()
+
+    def test_reassignment_moves_the_report(self):
+        report = WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='assigned')
+        report.assigned_worker = self.other
+        report.save()
+        self.assertEqual(self.stats(self.worker)['assigned'], 0)
+        self.assertEqual(self.stats(self.other)['assigned'], 1)
+        self.assertNoDrift()
+
+    def test_stale_instance_applies_the_stored_row(self):
+        report = WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='assigned')
+        stale = WasteReport.objects.get(pk=report.pk)
+        report.assigned_worker = self.other
+        report.save()
+        stale.status = 'resolved'
+        stale.save()
+        self.assertNoDrift()
+
+    def test_delete_removes_the_contribution(self):
+        report = WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='resolved', rating=4)
+        report.delete()
+        self.assertEqual(self.stats(self.worker)['assigned'], 0)
+        self.worker.refresh_from_db()
+        self.assertEqual((self.worker.total_ratings, self.worker.rating_sum), (0, 0))
+        self.assertNoDrift()
+
+    def test_reconcile_repairs_drift(self):
+        WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='assigned')
+        WorkerStats.objects.filter(worker=self.worker).update(assigned=5)
+        self.assertEqual(worker_stats.reconcile()[self.worker.id], {'assigned': (5, 1)})
+        self.assertNoDrift()
+
+
+class WorkerRatingTests(TestCase):
+    def setUp(self):
+        self.citizen = User.objects.create_user('citizen', password='x')
+        self.worker = User.objects.create_user('worker', password='x', role='worker')
+        self.api = APIClient()
+        self.api.force_authenticate(self.citizen)
+
+    def rate(self, report, rating):
+        response = self.api.post(f'/api/waste-reports/{report.id}/rate/', {'rating': rating})
+        self.assertEqual(response.status_code, 200)
+
+    def resolved_report(self):
+        return WasteReport.objects.create(citizen=self.citizen, assigned_worker=self.worker, status='resolved')
+
+    def test_ratings_update_the_worker_totals(self):
+        self.rate(self.resolved_report(), 5)
+        self.rate(self.resolved_report(), 2)
+        self.worker.refresh_from_db()
+        self.assertEqual((self.worker.total_ratings, self.worker.rating_sum), (2, 7))
+        self.assertAlmostEqual(self.worker.average_rating, 3.5)
+
+    def test_changing_a_rating_replaces_it(self):
+        report = self.resolved_report()
+        self.rate(report, 1)
+        self.rate(report, 4)
+        self.worker.refresh_from_db()
+        self.assertEqual((self.worker.total_ratings, self.worker.rating_sum), (1, 4))
+        self.assertAlmostEqual(self.worker.average_rating, 4.0)
+
+    def test_stale_user_save_keeps_the_totals(self):
+        stale = User.objects.get(pk=self.worker.pk)
+        self.rate(self.resolved_report(), 5)
+        stale.dark_mode = True
+        stale.save(update_fields=['dark_mode'])
+        self.worker.refresh_from_db()
+        self.assertEqual((self.worker.total_ratings, self.worker.rating_sum, self.worker.average_rating), (1, 5, 5.0))
+
+
+def pairwise_batches(reports, threshold_km=0.2):
+    """The original all-pairs batching, as a reference for the grid version"""
+    batches = []
+    visited = set()
+    for r1 in reports:
+        if r1['id'] in visited:
+            continue
+        batch = [r1]
+        visited.add(r1['id'])
+        for r2 in reports:
+            if r2['id'] in visited:
+                continue
+            if haversine_km(float(r1['lat']), float(r1['lng']), float(r2['lat']), float(r2['lng'])) <= threshold_km:
+                batch.append(r2)
+                visited.add(r2['id'])
+        batches.append({'main_report': r1, 'others': batch[1:], 'count': len(batch)})
+    return batches
+
+
+class BatchReportsTests(SimpleTestCase):
+    def random_reports(self, rng, n, sites, lat, lng, spread):
+        reports = []
+        for i in range(n):
+            # Mostly tight groups around a few sites, plus some loners
+            if rng.random() < 0.7:
+                site_lat, site_lng = rng.choice(sites)
+                reports.append({'id': i, 'lat': site_lat + rng.uniform(-0.002, 0.002), 'lng': site_lng + rng.uniform(-0.002, 0.002)})
+            else:
+                reports.append({'id': i, 'lat': lat + rng.uniform(-spread, spread), 'lng': lng + rng.uniform(-spread, spread)})
+        return reports
+
+    def test_matches_pairwise_batching(self):
+        rng = random.Random(7)
+        for lat, lng in ((28.61, 77.21), (-33.87, 151.21), (64.14, -21.94)):
+            sites = [(lat + rng.uniform(-0.05, 0.05), lng + rng.uniform(-0.05, 0.05)) for _ in range(8)]
+            reports = self.random_reports(rng, 300, sites, lat, lng, 0.05)
+            for threshold_km in (0.05, 0.2, 1.0):
+                with self.subTest(lat=lat, threshold_km=threshold_km):
+                    self.assertEqual(
+                        batch_reports_by_proximity(reports, threshold_km),
+                        pairwise_batches(reports, threshold_km),
+                    )
+
+    def test_string_coordinates_and_duplicates(self):
+        reports = [
+            {'id': 1, 'lat': '28.600000', 'lng': '77.200000'},
+            {'id': 2, 'lat': '28.600000', 'lng': '77.200000'},
+            {'id': 3, 'lat': '28.700000', 'lng': '77.200000'},
+        ]
+        self.assertEqual(batch_reports_by_proximity(reports), pairwise_batches(reports))
+        self.assertEqual([b['count'] for b in batch_reports_by_proximity(reports)], [2, 1])
+
+    def test_empty(self):
+        self.assertEqual(batch_reports_by_proximity([]), [])
+
+
+@override_settings(AUTO_DISPATCH_ENABLED=True)
+class AutoAssignTests(TestCase):
+    def setUp(self):
+        self.citizen = User.objects.create_user('citizen', password='x')
+        self.api = APIClient()
+        self.api.force_authenticate(self.citizen)
+        dispatch._index = None
+
+    def test_dispatch_failure_keeps_the_report_pending(self):
+        with mock.patch('reports.dispatch.get_presence', side_effect=ConnectionError('presence is down')):
+            with self.assertLogs('reports.dispatch', 'ERROR'):
+                response = self.api.post('/api/waste-reports/', {
+                    'waste_type': 'plastic', 'severity': 'low', 'latitude': '28.610000', 'longitude': '77.210000',
+                })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(WasteReport.objects.get().status, 'pending')
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class LocationConsumerTests(SimpleTestCase):
+    async def test_only_workers_can_open_the_worker_socket(self):
+        get_presence().clear()
+        for role in ('citizen', 'admin'):
+            user = User(id=1, username=role, role=role)
+            communicator = WebsocketCommunicator(LocationConsumer.as_asgi(), '/ws/location/worker/')
+            communicator.scope['user'] = user
+            communicator.scope['url_route'] = {'kwargs': {'role': 'worker'}}
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+        self.assertEqual(get_presence().online(), {})
@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .geo import distance_matrix, nearest_neighbour_order
+
+
+def solve_route(start_lat, start_lng, locations, time_budget=None):
+    """
+    In-process route optimizer for an open path starting at the worker.
+
+    Builds a nearest-neighbour tour, then improves it with 2-opt and Or-opt
+    moves until no move shortens it or `time_budget` seconds have passed.
+    locations: list of {'lat': lat, 'lng': lng, ...}; returns them reordered.
+    """
+    if time_budget is None:
+        time_budget = settings.ROUTE_OPTIMIZER_TIME_BUDGET
+    locations = list(locations)
+    if len(locations) < 3:
+        return [locations[i] for i in nearest_neighbour_order(
+            start_lat, start_lng,
+            [float(loc['lat']) for loc in locations],
+            [float(loc['lng']) for loc in locations],
+        )]
+
+    order = improve_path(
+        start_lat, start_lng,
+        [float(loc['lat']) for loc in locations],
+        [float(loc['lng']) for loc in locations],
+        time_budget,
+    )
+    return [locations[i] for i in order]
+
+
+def improve_path(start_lat, start_lng, lats, lngs, time_budget):
+    """Return an improved visiting order (indices into lats/lngs)"""
+    deadline = time.perf_counter() + time_budget
+    n = len(lats)
+
+    # Node 0 is the start, nodes 1..n the stops, node n+1 a free "end" node
+    # at zero distance from everything, which turns the open path into a
+    # closed tour with both ends pinned.
+    dist = np.zeros((n + 2, n + 2))
+    dist[:n + 1, :n + 1] = distance_matrix([start_lat, *lats], [start_lng, *lngs])
+
+    path = np.array([0] + [i + 1 for i in nearest_neighbour_order(start_lat, start_lng, lats, lngs)] + [n + 1])
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = two_opt_pass(path, dist, deadline)
+        improved = or_opt_pass(path, dist, deadline) or improved
+
+    return [int(node) - 1 for node in path[1:-1]]
+
+
+def path_length(path, dist):
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+def two_opt_pass(path, dist, deadline):
+    """Reverse path[i..j] wherever that shortens the tour; mutates path in place"""
+    last = len(path) - 2
+    improved = False
+    for i in range(1, last):
+        if time.perf_counter() >= deadline:
+            break
+        j = np.arange(i + 1, last + 1)
+        a, b = path[i - 1], path[i]
+        delta = dist[a, path[j]] + dist[b, path[j + 1]] - dist[a, b] - dist[path[j], path[j + 1]]
+        best = int(np.argmin(delta))
+        if delta[best] < -1e-9:
+            k = j[best]
+            path[i:k + 1] = path[i:k + 1][::-1]
+            improved = True
+    return improved
+
+
+def or_opt_pass(path, dist, deadline, max_segment=3):
+    """Move runs of up to max_segment stops elsewhere in the tour (optionally reversed)"""
+    last = len(path) - 2
+    improved = False
+    for seg_len in range(1, max_segment + 1):
+        i = 1
+        while i + seg_len - 1 <= last:
+            if time.perf_counter() >= deadline:
+                return improved
+            k = i + seg_len - 1
+            prev, first, tail, nxt = path[i - 1], path[i], path[k], path[k + 1]
+            removal_gain = dist[prev, first] + dist[tail, nxt] - dist[prev, nxt]
+
+            # Insertion edges (path[j], path[j+1]) that don't touch the segment
+            j = np.concatenate((np.arange(0, i - 1), np.arange(k + 1, last + 1)))
+            if len(j):
+                u, v = path[j], path[j + 1]
+                forward = dist[u, first] + dist[tail, v] - dist[u, v]
+                backward = dist[u, tail] + dist[first, v] - dist[u, v]
+                cost = np.minimum(forward, backward)
+                best = int(np.argmin(cost))
+                if cost[best] - removal_gain < -1e-9:
+                    segment = path[i:k + 1].copy()
+                    if backward[best] < forward[best]:
+                        segment = segment[::-1]
+                    rest = np.concatenate((path[:i], path[k + 1:]))
+                    at = int(j[best]) + 1 if j[best] < i else int(j[best]) + 1 - seg_len
+                    path[:] = np.concatenate((rest[:at], segment, rest[at:]))
+                    improved = True
+                    continue
+            i += 1
+    return improved
@@ -3,8 +3,6 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from django.db.models import Count
-from django.db.models.functions import TruncDay, TruncMonth
 from django.utils.timezone import localdate
 from datetime import timedelta
 import json
@@ -13,12 +11,15 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from .models import WasteReport, SupportTicket
+from .models import WasteReport, SupportTicket, WorkerStats
 from .forms import WasteReportForm, WasteReportEditForm, SupportTicketForm
 from django.utils import timezone
-from django.db.models import Count, Avg, F, ExpressionWrapper, fields, Q
+from django.db import transaction
+from django.db.models import F
 from notifications.models import Notification
 from .utils import send_realtime_notification
+from .dispatch import auto_assign
+from . import daily_stats
 import random
 
 User = get_user_model()
@@ -31,43 +32,23 @@ def admin_analytics(request):
     if not (request.user.is_superuser or getattr(request.user, "role", None) == "admin"):
         return render(request, "403.html", status=403)
 
-    total_reports = WasteReport.objects.count()
-    pending_count = WasteReport.objects.filter(status='pending').count()
-    resolved_count = WasteReport.objects.filter(status='resolved').count()
+    # Read from the daily rollup, never the report table
+    status_counts = daily_stats.counts_by("status")
+    by_status = {s["status"]: s["count"] for s in status_counts}
+    total_reports = sum(by_status.values())
+    pending_count = by_status.get("pending", 0)
+    resolved_count = by_status.get("resolved", 0)
     efficiency_rate = (resolved_count / total_reports * 100) if total_reports > 0 else 0
 
-    status_counts = list(
-        WasteReport.objects.values("status").annotate(count=Count("id"))
-    )
-    severity_counts = list(
-        WasteReport.objects.values("severity").annotate(count=Count("id"))
-    )
-    waste_type_counts = list(
-        WasteReport.objects.values("waste_type").annotate(count=Count("id"))
-    )
+    severity_counts = daily_stats.counts_by("severity")
+    waste_type_counts = daily_stats.counts_by("waste_type")
 
     start_date = localdate() - timedelta(days=6)
-
-    daily_reports = list(
-        WasteReport.objects
-        .filter(created_at__date__gte=start_date)
-        .annotate(day=TruncDay("created_at"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
-    )
-
-    monthly_qs = (
-        WasteReport.objects
-        .annotate(month=TruncMonth("created_at"))
-        .values("month")
-        .annotate(count=Count("id"))
-        .order_by("month")
-    )
+    daily_reports = daily_stats.daily(start_date)
 
     monthly_reports = [
         {"label": m["month"].strftime("%b %Y"), "count": m["count"]}
-        for m in monthly_qs
+        for m in daily_stats.monthly()
     ]
 
     return render(request, "dashboards/admin_analytics.html", {
@@ -93,6 +74,7 @@ def report_waste(request):
             report = form.save(commit=False)
             report.citizen = request.user
             report.save()
+            auto_assign(report)
             return redirect("citizen_dashboard")
         return render(request, "reports/report_waste.html", {"form": form})
 
@@ -139,17 +121,18 @@ def report_detail(request, pk):
             worker_id = request.POST.get("worker_id")
             if worker_id:
                 worker = get_object_or_404(User, id=worker_id)
-                report.assigned_worker = worker
-                report.status = "assigned"
-                report.save()
+                with transaction.atomic():
+                    report.assigned_worker = worker
+                    report.status = "assigned"
+                    report.save()
                 
-                # Notify Worker
-                send_realtime_notification(
-                    user=worker,
-                    title="Job Assigned 🚛",
-                    message=f"You have been assigned to Waste Report #{report.id}.",
-                    level="info"
-                )
+                    # Notify Worker
+                    send_realtime_notification(
+                        user=worker,
+                        title="Job Assigned 🚛",
+                        message=f"You have been assigned to Waste Report #{report.id}.",
+                        level="info"
+                    )
                 return redirect("report_detail", pk=pk)
 
     return render(request, "reports/report_detail.html", {
@@ -182,16 +165,17 @@ def resolve_report(request, report_id):
         )
         # Generate 6-digit OTP
         otp = str(random.randint(100000, 999999))
-        report.verification_otp = otp
-        report.save()
-
-        # Notify Citizen
-        send_realtime_notification(
-            user=report.citizen,
-            title="Cleanup Verification OTP",
-            message=f"The worker has completed the cleanup for your report. Please share this OTP with them to verify: {otp}",
-            level="success"
-        )
+        with transaction.atomic():
+            report.verification_otp = otp
+            report.save()
+
+            # Notify Citizen
+            send_realtime_notification(
+                user=report.citizen,
+                title="Cleanup Verification OTP",
+                message=f"The worker has completed the cleanup for your report. Please share this OTP with them to verify: {otp}",
+                level="success"
+            )
         
         # Add a success message or flag to the session to show OTP input on the dashboard
         request.session[f'verifying_report_{report_id}'] = True
@@ -211,18 +195,19 @@ def verify_otp(request, report_id):
         )
 
         if report.verification_otp == otp_input:
-            report.status = "resolved"
-            report.resolved_at = timezone.now()
-            report.verification_otp = None # Clear OTP after use
-            report.save()
+            with transaction.atomic():
+                report.status = "resolved"
+                report.resolved_at = timezone.now()
+                report.verification_otp = None # Clear OTP after use
+                report.save()
             
-            # Final notification to citizen
-            send_realtime_notification(
-                user=report.citizen,
-                title="Cleanup Confirmed! 🎉",
-                message=f"Your waste report #{report.id} has been verified and successfully cleaned up.",
-                level="success"
-            )
+                # Final notification to citizen
+                send_realtime_notification(
+                    user=report.citizen,
+                    title="Cleanup Confirmed! 🎉",
+                    message=f"Your waste report #{report.id} has been verified and successfully cleaned up.",
+                    level="success"
+                )
             
             if f'verifying_report_{report_id}' in request.session:
                 del request.session[f'verifying_report_{report_id}']
@@ -318,17 +303,18 @@ def admin_all_reports(request):
     if request.method == "POST":
         report = get_object_or_404(WasteReport, id=request.POST.get("report_id"))
         worker = get_object_or_404(User, id=request.POST.get("worker_id"))
-        report.assigned_worker = worker
-        report.status = "assigned"
-        report.save()
-
-        # Notify Worker
-        send_realtime_notification(
-            user=worker,
-            title="New Job Assigned 🚛",
-            message=f"You have been assigned to clean up Waste Report #{report.id} ({report.get_waste_type_display()}).",
-            level="info"
-        )
+        with transaction.atomic():
+            report.assigned_worker = worker
+            report.status = "assigned"
+            report.save()
+
+            # Notify Worker
+            send_realtime_notification(
+                user=worker,
+                title="New Job Assigned 🚛",
+                message=f"You have been assigned to clean up Waste Report #{report.id} ({report.get_waste_type_display()}).",
+                level="info"
+            )
         return redirect("admin_all_reports")
 
     return render(request, "dashboards/admin_reports.html", {
@@ -348,50 +334,9 @@ def admin_all_reports(request):
 # =====================================================
 @login_required
 def waste_map_view(request):
-    # 1. Role Restriction
-    if getattr(request.user, "role", "citizen") == "citizen":
-        reports = WasteReport.objects.filter(citizen=request.user)
-    else:
-        # Admin / Worker see all
-        reports = WasteReport.objects.all()
-
-    # 2. Filters
-    severity = request.GET.get("severity")
-    status = request.GET.get("status")
-    waste_type = request.GET.get("waste_type")
-    days = request.GET.get("days")  # time filter
-
-    if severity:
-        reports = reports.filter(severity=severity)
-    if status:
-        reports = reports.filter(status=status)
-    if waste_type:
-        reports = reports.filter(waste_type=waste_type)
-    
-    if days:
-        try:
-            d = int(days)
-            start_date = timezone.now() - timedelta(days=d)
-            reports = reports.filter(created_at__gte=start_date)
-        except ValueError:
-            pass
-
-    data = []
-    for r in reports:
-        if r.latitude and r.longitude:
-            data.append({
-                "id": r.id,
-                "lat": float(r.latitude),
-                "lng": float(r.longitude),
-                "waste_type": r.get_waste_type_display(),
-                "severity": r.get_severity_display(),
-                "status": r.status,
-                "created_at": r.created_at.strftime("%Y-%m-%d %H:%M"),
-                "image": r.image.url if r.image else "",
-                "detail_url": f"/reports/detail/{r.id}/"
-            })
-
-    return render(request, "dashboards/map_view.html", {"reports": data})
+    # Reports are fetched per viewport from /api/waste-reports/map/, which
+    # applies the role restriction and the ?severity/status/waste_type/days filters
+    return render(request, "dashboards/map_view.html")
 
 @login_required
 def delete_report(request, pk):
@@ -463,25 +408,22 @@ def worker_performance_dashboard(request):
     if not (request.user.is_superuser or getattr(request.user, "role", None) == "admin"):
         return render(request, "403.html")
 
-    workers = User.objects.filter(role="worker").annotate(
-        total_assigned=Count("assigned_reports"),
-        resolved_count=Count("assigned_reports", filter=Q(assigned_reports__status="resolved")),
-        pending_count=Count("assigned_reports", filter=Q(assigned_reports__status__in=["pending", "assigned"])),
-        avg_resolution_time=Avg(
-            ExpressionWrapper(
-                F("assigned_reports__resolved_at") - F("assigned_reports__created_at"),
-                output_field=fields.DurationField()
-            ),
-            filter=Q(assigned_reports__status="resolved")
-        )
-    ).order_by("-resolved_count")
+    # Precomputed per-worker totals (reports.worker_stats); no join over reports
+    workers = (
+        User.objects.filter(role="worker")
+        .select_related("performance")
+        .order_by(F("performance__resolved").desc(nulls_last=True))
+    )
 
     # Helper to format duration
     worker_list = []
     for w in workers:
-        td = w.avg_resolution_time
-        if td:
-            total_seconds = int(td.total_seconds())
+        stats = getattr(w, "performance", None) or WorkerStats(worker=w)
+        w.total_assigned = stats.assigned
+        w.resolved_count = stats.resolved
+        w.pending_count = stats.pending
+        if stats.avg_resolution_seconds:
+            total_seconds = int(stats.avg_resolution_seconds)
             days = total_seconds // 86400
             hours = (total_seconds % 86400) // 3600
             minutes = (total_seconds % 3600) // 60
@@ -529,28 +471,20 @@ def rate_report(request, report_id):
         
         if rating and rating.isdigit():
             rating_val = int(rating)
-            report.rating = rating_val
-            report.review_text = review_text
-            report.save()
-            
-            # Update Worker Performance
-            worker = report.assigned_worker
-            if worker:
-                # Calculate new average
-                stats = WasteReport.objects.filter(assigned_worker=worker, rating__isnull=False).aggregate(
-                    avg_rating=Avg('rating'),
-                    count=Count('id')
-                )
-                worker.average_rating = stats['avg_rating'] or 0.0
-                worker.total_ratings = stats['count'] or 0
-                worker.save()
-
-                send_realtime_notification(
-                    user=worker,
-                    title="New Review Received! ⭐",
-                    message=f"A citizen rated your cleanup for Report #{report.id} as {rating_val}/5 stars.",
-                    level="success"
-                )
+            with transaction.atomic():
+                report.rating = rating_val
+                report.review_text = review_text
+                # Worker rating totals follow by F() increments (reports.worker_stats)
+                report.save(update_fields=["rating", "review_text"])
+
+                worker = report.assigned_worker
+                if worker:
+                    send_realtime_notification(
+                        user=worker,
+                        title="New Review Received! ⭐",
+                        message=f"A citizen rated your cleanup for Report #{report.id} as {rating_val}/5 stars.",
+                        level="success"
+                    )
                 
         return redirect("/dashboard/citizen/")
     
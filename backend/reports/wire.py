@@ -0,0 +1,79 @@
+import struct
+
+# Negotiated with Sec-WebSocket-Protocol, or ?format=bin on the socket URL
+SUBPROTOCOL = 'wcm.loc.bin.v1'
+
+# Every frame starts with a one byte type; integers are little-endian
+FRAME_POSITION = 1   # worker id, absolute lat/lng in micro-degrees
+FRAME_DELTA = 2      # worker id, lat/lng change since the last frame for that worker
+FRAME_NAME = 3       # worker id, then the UTF-8 display name (once per worker per session)
+
+POSITION = struct.Struct('<BIii')
+DELTA = struct.Struct('<BIhh')
+NAME = struct.Struct('<BI')
+
+SCALE = 1_000_000  # 1e-6 degrees, ~0.11 m
+DELTA_MAX = 32767
+
+
+def quantize(value):
+    return int(round(float(value) * SCALE))
+
+
+def wants_binary(scope):
+    if SUBPROTOCOL in scope.get('subprotocols', []):
+        return True
+    return b'format=bin' in scope.get('query_string', b'').split(b'&')
+
+
+class LocationEncoder:
+    """
+    Per-connection encoder for location frames.
+
+    The first fix for a worker goes out as an absolute POSITION frame
+    (13 bytes) preceded by a NAME frame; later ones as a DELTA frame
+    (9 bytes) unless the move doesn't fit in 16 bits (~3.6 km).
+    """
+
+    def __init__(self):
+        self.last = {}
+        self.named = set()
+
+    def encode(self, worker_id, lat, lng, name=None):
+        """Frames (bytes) to send for one fix, in order"""
+        frames = []
+        if worker_id not in self.named and name is not None:
+            frames.append(NAME.pack(FRAME_NAME, worker_id) + name.encode('utf-8'))
+            self.named.add(worker_id)
+
+        qlat, qlng = quantize(lat), quantize(lng)
+        prev = self.last.get(worker_id)
+        self.last[worker_id] = (qlat, qlng)
+        if prev is not None:
+            dlat, dlng = qlat - prev[0], qlng - prev[1]
+            if abs(dlat) <= DELTA_MAX and abs(dlng) <= DELTA_MAX:
+                frames.append(DELTA.pack(FRAME_DELTA, worker_id, dlat, dlng))
+                return frames
+        frames.append(POSITION.pack(FRAME_POSITION, worker_id, qlat, qlng))
+        return frames
+
+
+def decode(frame, state):
+    """
+    Reference decoder (mirrors the JS client). `state` is a dict kept across
+    frames; returns ('name', worker_id, name) or ('position', worker_id, lat, lng).
+    """
+    kind = frame[0]
+    if kind == FRAME_NAME:
+        _, wid = NAME.unpack_from(frame)
+        return ('name', wid, frame[NAME.size:].decode('utf-8'))
+    if kind == FRAME_POSITION:
+        _, wid, qlat, qlng = POSITION.unpack(frame)
+    elif kind == FRAME_DELTA:
+        _, wid, dlat, dlng = DELTA.unpack(frame)
+        qlat, qlng = state[wid]
+        qlat, qlng = qlat + dlat, qlng + dlng
+    else:
+        raise ValueError(f"Unknown frame type {kind}")
+    state[wid] = (qlat, qlng)
+    return ('position', wid, qlat / SCALE, qlng / SCALE)
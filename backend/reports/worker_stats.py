@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import WasteReport, WorkerStats
+
+COUNTERS = ('assigned', 'resolved', 'pending', 'resolution_count', 'resolution_seconds', 'rating_count', 'rating_sum')
+
+
+def contribution(row):
+    """What one report (a dict of its stored fields) adds to its worker's totals"""
+    resolved = row['status'] == 'resolved'
+    timed = resolved and row['resolved_at'] is not None
+    return {
+        'assigned': 1,
+        'resolved': int(resolved),
+        'pending': int(row['status'] in ('pending', 'assigned')),
+        'resolution_count': int(timed),
+        'resolution_seconds': (row['resolved_at'] - row['created_at']).total_seconds() if timed else 0.0,
+        'rating_count': int(row['rating'] is not None),
+        'rating_sum': row['rating'] or 0,
+    }
+
+
+def _add(worker_id, delta):
+    """Apply a delta to one worker's row: a single UPDATE, or an INSERT the first time"""
+    delta = {name: value for name, value in delta.items() if value}
+    if not delta:
+        return
+    if 'rating_sum' in delta or 'rating_count' in delta:
+        _rate(worker_id, delta.get('rating_sum', 0), delta.get('rating_count', 0))
+    rows = WorkerStats.objects.filter(worker_id=worker_id)
+    if rows.update(**{name: F(name) + value for name, value in delta.items()}):
+        return
+    try:
+        with transaction.atomic():
+            WorkerStats.objects.create(worker_id=worker_id, **delta)
+    except IntegrityError:
+        # Created concurrently
+        rows.update(**{name: F(name) + value for name, value in delta.items()})
+
+
+def _rate(worker_id, sum_delta, count_delta):
+    """
+    The worker's rating totals on the user row, in one UPDATE writing only
+    those columns; average_rating is computed from the incremented values in
+    the same statement, so concurrent ratings and location writes can't
+    clobber it.
+    """
+    total = F('rating_sum') + sum_delta
+    count = F('total_ratings') + count_delta
+    get_user_model().objects.filter(pk=worker_id).update(
+        rating_sum=total,
+        total_ratings=count,
+        average_rating=Coalesce(Cast(total, FloatField()) / NullIf(count, 0), 0.0),
+    )
+
+
+def _apply(old, new):
+    """Move a report's contribution from its stored state to its new one"""
+    old_worker = old['assigned_worker_id'] if old else None
+    new_worker = new['assigned_worker_id'] if new else None
+    before = contribution(old) if old_worker else dict.fromkeys(COUNTERS, 0)
+    after = contribution(new) if new_worker else dict.fromkeys(COUNTERS, 0)
+    if old_worker == new_worker:
+        if new_worker:
+            _add(new_worker, {name: after[name] - before[name] for name in COUNTERS})
+        return
+    if old_worker:
+        _add(old_worker, {name: -value for name, value in before.items()})
+    if new_worker:
+        _add(new_worker, after)
+
+
+def report_saved(report, stored):
+    """Call from post_save with the row as it was before the save (signals.stored_row)"""
+    _apply(stored, {f: getattr(report, f) for f in ('created_at', 'status', 'assigned_worker_id', 'resolved_at', 'rating')})
+
+
+def report_deleted(stored):
+    _apply(stored, None)
+
+
+def compute_all():
+    """{worker_id: totals} recomputed from the report table in one grouped query"""
+    duration = ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())
+    timed = Q(status='resolved', resolved_at__isnull=False)
+    rows = (
+        WasteReport.objects.filter(assigned_worker__isnull=False)
+        .values('assigned_worker_id')
+        .annotate(
+            assigned=Count('id'),
+            resolved=Count('id', filter=Q(status='resolved')),
+            pending=Count('id', filter=Q(status__in=['pending', 'assigned'])),
+            resolution_count=Count('id', filter=timed),
+            resolution_time=Sum(duration, filter=timed),
+            rating_count=Count('rating'),
+            rating_sum=Sum('rating'),
+        )
+        .order_by()
+    )
+    totals = {}
+    for row in rows.iterator():
+        worker_id = row.pop('assigned_worker_id')
+        time = row.pop('resolution_time')
+        row['resolution_seconds'] = time.total_seconds() if time else 0.0
+        row['rating_sum'] = row['rating_sum'] or 0
+        totals[worker_id] = row
+    return totals
+
+
+def reconcile(fix=True):
+    """
+    Compare every WorkerStats row, and the rating totals on the user rows,
+    with a full recount. Returns
+    {worker_id: {counter: (stored, actual)}} for the rows that drifted, and
+    rewrites the table from the recount when `fix` is set.
+    """
+    actual = compute_all()
+    stored = {s.worker_id: s for s in WorkerStats.objects.all()}
+    drift = {}
+    for worker_id in actual.keys() | stored.keys():
+        have = stored.get(worker_id)
+        want = actual.get(worker_id, dict.fromkeys(COUNTERS, 0))
+        diff = {}
+        for name in COUNTERS:
+            old = getattr(have, name) if have else 0
+            # Running float sums pick up rounding; a second is not drift
+            if abs(old - want[name]) >= (1 if name == 'resolution_seconds' else 1e-9):
+                diff[name] = (old, want[name])
+        if diff:
+            drift[worker_id] = diff
+
+    # Rating totals kept on the user row
+    User = get_user_model()
+    users = User.objects.filter(Q(pk__in=actual.keys()) | ~Q(total_ratings=0) | ~Q(rating_sum=0))
+    fixed_users = []
+    for user in users.only('id', 'rating_sum', 'total_ratings', 'average_rating'):
+        want = actual.get(user.pk, {'rating_sum': 0, 'rating_count': 0})
+        if (user.rating_sum, user.total_ratings) != (want['rating_sum'], want['rating_count']):
+            drift.setdefault(user.pk, {})['user.rating_sum/total_ratings'] = (
+                (user.rating_sum, user.total_ratings), (want['rating_sum'], want['rating_count']),
+            )
+            user.rating_sum = want['rating_sum']
+            user.total_ratings = want['rating_count']
+            user.average_rating = want['rating_sum'] / want['rating_count'] if want['rating_count'] else 0.0
+            fixed_users.append(user)
+
+    if fix:
+        with transaction.atomic():
+            User.objects.bulk_update(fixed_users, ['rating_sum', 'total_ratings', 'average_rating'], batch_size=1000)
+            WorkerStats.objects.all().delete()
+            WorkerStats.objects.bulk_create(
+                [WorkerStats(worker_id=worker_id, **totals) for worker_id, totals in actual.items()],
+                batch_size=1000,
+            )
+    return drift
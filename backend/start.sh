@@ -7,6 +7,11 @@ PORT=${PORT:-10000}
 echo "--> Starting migration..."
 python manage.py migrate --no-input
 
+echo "--> Starting notification dispatcher"
+# Notifications are queued in an outbox and only created/pushed by this process
+# (notifications/outbox.py); restart it if it ever exits
+(while true; do python manage.py dispatch_notifications || true; sleep 2; done) &
+
 echo "--> Starting Gunicorn on 0.0.0.0:$PORT"
 # Use Gunicorn with Uvicorn workers for production-grade ASGI handling
 # -k uvicorn.workers.UvicornWorker: Use Uvicorn worker class